@@ -10,4 +10,5 @@ base=\"dark\"\n\
 headless = true\n\
 port = $PORT\n\
 enableCORS = false\n\
+enableStaticServing = true\n\
 " > .streamlit/config.toml
\ No newline at end of file
@@ -3,27 +3,45 @@ from types import ModuleType
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
 import seaborn as sn
 import streamlit
 
 import config_file
-from streamlit_multipage import MultiPage
+from streamlit_multipage import DataContext, MultiPage
+from utils.aggregation import active_players_aggregate, common_matchups_aggregate
+from utils.catalog import DATASETS, get_snapshot_entry
 from utils.extraction import (
-    get_latest_pickle_date,
+    get_snapshot_key,
     load_matches,
     load_rankings,
     load_tournaments,
 )
+from utils.courts import MIN_MATCH_MINUTES, court_utilization
+from utils.cube import AnalyticsCube, match_cube_aggregate, tournament_cube_aggregate
+from utils.exports import available_export_formats, render_export_button
+from utils.filtering import (
+    COVID_ERAS,
+    StudyFilter,
+    apply_study_filter,
+    filtered_aggregates,
+    filtered_models,
+)
+from utils.form import FORM_WINDOW
+from utils.games import GAMES, score_tensor
 from utils.general import (
     caption_text,
     color_covid,
-    convert_df_to_csv,
     custom_css,
+    header_image,
     hide_table_row_index,
 )
+from utils.match_store import query_matches
+from utils.network import PlayerNetwork
+from utils.profiles import PlayerProfile, PlayerProfileStore
+from utils.search import PlayerSearchIndex
 from utils.styles import custom_palette_3
+from utils.summary import get_snapshot_summary, summarize
 
 # Display mode either "dev" or "prod" from config.
 display_mode = config_file.display["mode"]
@@ -40,14 +58,16 @@ streamlit.set_page_config(
 )
 
 
-def data_analysis(st_lib: ModuleType, **state: dict) -> None:
+def data_analysis(st_lib: ModuleType, context: DataContext, **state: dict) -> None:
     custom_css(background_path="res/neon_court2.png")
     plt.style.use("ggplot")
 
     # Page header.
     _, header_image_container, _ = st_lib.columns([1, 4, 1])
-    header_image_container.image(
-        "res/court3.png", caption="Imagery: ASB TPoint Squash Courts"
+    header_image(
+        header_image_container,
+        "res/court3.png",
+        caption="Imagery: ASB TPoint Squash Courts",
     )
     header_text_container = st_lib.container()
     header_text_container.title(
@@ -118,20 +138,27 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
         """
     )
 
-    tournaments_df = load_tournaments(skip=config_file.data["skip_fetch"])
-    matches_df = load_matches(
-        skip=config_file.data["skip_fetch"], tournaments_df=tournaments_df
-    )
-    rankings_df = load_rankings(skip=config_file.data["skip_fetch"])
+    tournaments_df = context["tournaments"]
+    matches_df = context["matches"]
+    rankings_df = context["rankings"]
+    summary = context["summary"]
 
     loading_container.info(
-        f"Tournament data is ready! The data covers **{len(tournaments_df)} tournaments** from {str(tournaments_df['StartDatePandas'].min().date())} until {str(tournaments_df['StartDatePandas'].max().date())}."
+        f"Tournament data is ready! The data covers **{summary.tournaments} tournaments** from {summary.first_tournament} until {summary.last_tournament}."
     )
     loading_container.info(
-        f"Match data is ready! The data covers **{len(matches_df)} matches** from {str(matches_df['MatchDatePandas'].min().date())} until {str(matches_df['MatchDatePandas'].max().date())}."
+        f"Match data is ready! The data covers **{summary.matches} matches** from {summary.first_match} until {summary.last_match}."
     )
     loading_container.info(
-        f"Ranking data is ready! The data covers **{len(rankings_df.loc[rankings_df['division'] == 'All Men'])} men** and **{len(rankings_df.loc[rankings_df['division'] == 'All Women'])} women**."
+        f"Ranking data is ready! The data covers **{summary.players_by_division.get('All Men', 0)} men** and **{summary.players_by_division.get('All Women', 0)} women**."
+    )
+    snapshot_date = dt.date.fromisoformat(
+        get_snapshot_entry(
+            "matches", as_of=config_file.data["as_of"], ngb_id=context.partition
+        )["date"]
+    )
+    loading_container.info(
+        f"The data snapshot is from **{str(snapshot_date)}** ({(dt.date.today() - snapshot_date).days} days old)."
     )
     loading_container.success("⬇ All data has been fetched. Let's move on! ⬇")
     loading_container.markdown("---")
@@ -167,24 +194,106 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
         """,
         unsafe_allow_html=True,
     )
-    st_lib.sidebar.download_button(
-        label="Tournament data",
-        data=convert_df_to_csv(tournaments_df),
-        file_name=f"tournaments_{str(get_latest_pickle_date('data/tournaments*'))}.csv",
-        mime="text/csv",
+    as_of = config_file.data["as_of"]
+    export_format = st_lib.sidebar.selectbox(
+        "Format", available_export_formats(), key="export_format"
     )
-    st_lib.sidebar.download_button(
+    render_export_button(
+        st_lib.sidebar,
+        label="Tournament data",
+        name=f"tournaments_{context.partition}",
+        df_to_export=tournaments_df,
+        snapshot_date=get_snapshot_entry(
+            "tournaments", as_of=as_of, ngb_id=context.partition
+        )["date"],
+        export_format=export_format,
+    )
+    render_export_button(
+        st_lib.sidebar,
         label="Match data",
-        data=convert_df_to_csv(matches_df),
-        file_name=f"matches_{str(get_latest_pickle_date('data/matches*'))}.csv",
-        mime="text/csv",
-    )
-    st_lib.sidebar.download_button(
+        name=f"matches_{context.partition}",
+        df_to_export=matches_df,
+        snapshot_date=get_snapshot_entry(
+            "matches", as_of=as_of, ngb_id=context.partition
+        )["date"],
+        export_format=export_format,
+    )
+    render_export_button(
+        st_lib.sidebar,
         label="Ranking data",
-        data=convert_df_to_csv(rankings_df),
-        file_name=f"rankings_{str(get_latest_pickle_date('data/rankings*'))}.csv",
-        mime="text/csv",
+        name=f"rankings_{context.partition}",
+        df_to_export=rankings_df,
+        snapshot_date=get_snapshot_entry(
+            "rankings", as_of=as_of, ngb_id=context.partition
+        )["date"],
+        export_format=export_format,
+    )
+
+    st_lib.sidebar.markdown(
+        """
+        <h1 style="text-align:center;">Filters</h1>
+        """,
+        unsafe_allow_html=True,
     )
+    first_date = min(
+        tournaments_df["StartDatePandas"].min(), matches_df["MatchDatePandas"].min()
+    ).date()
+    last_date = max(
+        tournaments_df["StartDatePandas"].max(), matches_df["MatchDatePandas"].max()
+    ).date()
+    date_range = st_lib.sidebar.date_input(
+        "Date range",
+        value=(first_date, last_date),
+        min_value=first_date,
+        max_value=last_date,
+    )
+    covid_era = st_lib.sidebar.selectbox("Covid era", list(COVID_ERAS))
+    divisions = st_lib.sidebar.multiselect(
+        "Division", sorted(matches_df["Division"].unique())
+    )
+    study_filter = StudyFilter(
+        start=date_range[0],
+        end=date_range[-1],
+        covid=COVID_ERAS[covid_era],
+        divisions=tuple(divisions),
+    )
+    if study_filter == StudyFilter(first_date, last_date):
+        aggregates = {
+            name: context[name]
+            for name in [
+                "active_players",
+                "common_matchups",
+                "cube",
+                "summary",
+                "court_utilization",
+                "player_network",
+            ]
+        }
+    else:
+        tournaments_df, matches_df = apply_study_filter(
+            tournaments_df, matches_df, study_filter
+        )
+        if len(tournaments_df) == 0 or len(matches_df) == 0:
+            st_lib.warning("No tournaments or matches match the selected filters.")
+            return
+        aggregates = {
+            **filtered_aggregates(
+                context.snapshot,
+                context.partition,
+                study_filter,
+                tournaments_df,
+                matches_df,
+                rankings_df,
+            ),
+            **filtered_models(
+                context.snapshot,
+                context.partition,
+                study_filter,
+                tournaments_df,
+                matches_df,
+            ),
+        }
+    summary = aggregates["summary"]
 
     tournament_container = st_lib.container()
 
@@ -196,15 +305,15 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
 
         #### 3.1 First things first: some fun statistics
 
-        Club Locker history contains **{len(tournaments_df)}** tournaments and **{len(matches_df)}** matches. Here are some cool insights:
+        Club Locker history contains **{summary.tournaments}** tournaments and **{summary.matches}** matches. Here are some cool insights:
 
-        - Total number of games: **{matches_df["NumberOfGames"].sum()}**
-        - Total number of rallies: **{matches_df["Rallies"].sum()}**
-        - Total time spent on court: **{matches_df["MatchDuration"].sum()}** minutes = **{int(matches_df["MatchDuration"].sum()/60)}** hours = **{round(matches_df["MatchDuration"].sum()/(60*24), 1)}** days
-        - Average number of games in a match: **{round(matches_df["NumberOfGames"].mean(), 2)}**
-        - Average number of rallies in a match: **{round(matches_df["Rallies"].mean(), 2)}**
-        - Average match length: **{round(matches_df["MatchDuration"].mean(), 2)}** minutes
-        - Average number of players in a tournament: **{round(tournaments_df["NumPlayers"].mean(), 2)}**
+        - Total number of games: **{summary.games}**
+        - Total number of rallies: **{summary.rallies}**
+        - Total time spent on court: **{summary.minutes}** minutes = **{int(summary.minutes/60)}** hours = **{round(summary.minutes/(60*24), 1)}** days
+        - Average number of games in a match: **{round(summary.average_games, 2)}**
+        - Average number of rallies in a match: **{round(summary.average_rallies, 2)}**
+        - Average match length: **{round(summary.average_minutes, 2)}** minutes
+        - Average number of players in a tournament: **{round(summary.average_players, 2)}**
 
         There are plenty more insights that you can draw from the data. If you'd like to play around with the data, you can do so yourself. Please find the download links for the pre-processed datasets by expanding the menu to the left on this page.
         """
@@ -266,14 +375,8 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
     )
     fig, axes = plt.subplots()
 
-    tournament_players_months_weeks = (
-        tournaments_df[["Year", "Month", "NumPlayers"]]
-        .groupby(by=["Month", "Year"])
-        .sum()[["NumPlayers"]]
-        .reset_index()
-        .pivot(columns=["Year"], index=["Month"], values=["NumPlayers"])
-        .fillna(0)
-        .astype(int)
+    tournament_players_months_weeks = aggregates["cube"].table(
+        "Participants", index="Month", columns="Year"
     )
 
     sn.heatmap(
@@ -384,28 +487,7 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
         """
     )
 
-    active_players_df = (
-        pd.concat(
-            [
-                matches_df.groupby(by=["LoserPlayer"])
-                .count()
-                .reset_index(names="Player"),
-                matches_df.groupby(by=["WinnerPlayer"])
-                .count()
-                .reset_index(names="Player"),
-            ]
-        )
-        .groupby(by="Player")
-        .sum()
-        .sort_values(by="matchid", ascending=False)
-        .reset_index()[["Player", "WinnerPlayer", "LoserPlayer"]]
-    )
-    active_players_df["TotalMatches"] = (
-        active_players_df["WinnerPlayer"] + active_players_df["LoserPlayer"]
-    )
-    active_players_df[["WinnerPlayer", "LoserPlayer"]] = active_players_df[
-        ["LoserPlayer", "WinnerPlayer"]
-    ]
+    active_players_df = aggregates["active_players"]
 
     fig, axes = plt.subplots()
     sn.barplot(
@@ -429,15 +511,7 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
         One of the best aspects of competitive squash is the formation of friendly rivalries when two relatively equally skilled players meet each other. Based on the players' activity and pure luck, a rivalrous matchup can happen surprisingly often. Here's a breakdown of the top {show_results} most common matchups that have taken place!
         """
     )
-    common_matchups_df = (
-        matches_df.groupby(by=["WinnerPlayer", "LoserPlayer"])
-        .count()
-        .sort_values(by="matchid", ascending=False)
-        .reset_index(names=["Player1", "Player2"])[["Player1", "Player2", "matchid"]]
-    )
-    common_matchups_df["Matchup"] = common_matchups_df["Player1"].str.cat(
-        common_matchups_df["Player2"], sep=" vs. "
-    )
+    common_matchups_df = aggregates["common_matchups"]
     fig, axes = plt.subplots()
     sn.barplot(
         data=common_matchups_df.head(show_results),
@@ -458,6 +532,28 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
         """
     )
 
+    player_network = aggregates["player_network"]
+    player_activity_container.markdown(
+        f"""
+        #### 4.3 The player network
+        Every match connects two players, and together the matches form a network of who has played whom. Players who are not connected to each other through any chain of opponents form separate pools, and their ratings cannot really be compared with each other. The network has **{len(player_network.components)} such pools**, the largest of which has **{player_network.components["Players"].iloc[0]} players**.
+        """
+    )
+    player_activity_container.dataframe(
+        player_network.components.head(show_results), use_container_width=True
+    )
+    player_activity_container.markdown(
+        f"""
+        Some players are more central to the network than others. Here are the top {show_results} players by centrality, which weighs not only how many opponents a player has met but also how well connected those opponents are.
+        """
+    )
+    player_activity_container.dataframe(
+        player_network.players.sort_values(by="CentralityRank")
+        .head(show_results)
+        .set_index("Player")[["Component", "Matches", "Opponents", "CentralityRank"]],
+        use_container_width=True,
+    )
+
     player_activity_container.markdown("---")
 
     demographics_container = st_lib.container()
@@ -686,6 +782,80 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
         """
     )
 
+    utilization = aggregates["court_utilization"]
+    court_tournaments_df = utilization.tournaments.sort_values(
+        by="Day", ascending=False
+    )
+    court_sessions_df = utilization.sessions
+    court_busy_percentage = round(
+        100
+        * court_sessions_df["CourtMinutes"].sum()
+        / (court_sessions_df["Courts"] * court_sessions_df["SpanMinutes"]).sum()
+    )
+    match_container.markdown(
+        f"""
+        #### 6.2 Court utilization
+        Matches have a start and an end time, so we can count how many matches are in play at any moment of a tournament day. This tells how many courts a tournament really needs, how long the courts stand empty between matches, and how much longer the days are than the schedule. Matches shorter than {MIN_MATCH_MINUTES} minutes are left out, since those were entered after the fact.
+
+        Over all tournaments, the courts in use are busy **{court_busy_percentage}%** of the time, and a tournament day runs on average **{round(court_sessions_df["Overrun"].mean())} minutes** over its schedule.
+        """
+    )
+    match_container.dataframe(
+        court_tournaments_df.set_index("TournamentName")[
+            [
+                "Days",
+                "Matches",
+                "Courts",
+                "PeakCourts",
+                "Utilization",
+                "IdleMinutes",
+                "LongestIdleGap",
+                "Overrun",
+            ]
+        ].round(),
+        use_container_width=True,
+    )
+    court_tournament_id = match_container.selectbox(
+        "Tournament",
+        court_tournaments_df.index,
+        format_func=lambda tournament_id: court_tournaments_df.loc[
+            tournament_id, "TournamentName"
+        ],
+    )
+    selected_sessions_df = court_sessions_df.loc[
+        court_sessions_df["TournamentID"] == court_tournament_id
+    ]
+    timeline_df = utilization.timeline.loc[
+        utilization.timeline["Session"].isin(selected_sessions_df.index)
+    ]
+    timeline_df["Day"] = (
+        selected_sessions_df["Day"].dt.date.loc[timeline_df["Session"]].values
+    )
+    timeline_df["Hours"] = (
+        timeline_df["Time"] - timeline_df.groupby(by="Session")["Time"].transform("min")
+    ).dt.total_seconds() / 3600
+    fig, axes = plt.subplots()
+    sn.lineplot(
+        ax=axes,
+        data=timeline_df,
+        x="Hours",
+        y="Concurrent",
+        hue="Day",
+        drawstyle="steps-post",
+        estimator=None,
+        palette=sn.color_palette("husl", len(selected_sessions_df)),
+    )
+    axes.set_xlabel("Hours since the first match of the day")
+    axes.set_ylabel("Matches in play")
+    match_container.pyplot(fig)
+    match_container.markdown(
+        caption_text(
+            "Figure 11",
+            f"Matches in play during {court_tournaments_df.loc[court_tournament_id, 'TournamentName']}.",
+        ),
+        unsafe_allow_html=True,
+    )
+
     ending_container = st_lib.container()
     ending_container.markdown(
         """
@@ -704,11 +874,13 @@ def data_analysis(st_lib: ModuleType, **state: dict) -> None:
     )
 
 
-def player_vs_player(st_lib: ModuleType, **state: dict) -> None:
+def player_vs_player(st_lib: ModuleType, context: DataContext, **state: dict) -> None:
     custom_css(background_path="res/neon_court4.png")
     _, header_image_container, _ = st_lib.columns([1, 4, 1])
-    header_image_container.image(
-        "res/court4.png", caption="Imagery: ASB TPoint Squash Courts"
+    header_image(
+        header_image_container,
+        "res/court4.png",
+        caption="Imagery: ASB TPoint Squash Courts",
     )
     header_text_container = st_lib.container()
     header_text_container.title(
@@ -738,46 +910,20 @@ def player_vs_player(st_lib: ModuleType, **state: dict) -> None:
         """
     )
 
-    tournaments_df = load_tournaments(skip=config_file.data["skip_fetch"])
-    matches_df = load_matches(
-        skip=config_file.data["skip_fetch"], tournaments_df=tournaments_df
-    )
-    rankings_df = load_rankings(skip=config_file.data["skip_fetch"])
+    matches_df = context["matches"]
+    rankings_df = context["rankings"]
 
     player_1_selection_container, player_2_selection_container = st_lib.columns(2)
-    unique_player_names = np.sort(
-        pd.unique(matches_df[["vPlayerName", "hPlayerName"]].values.ravel("K"))
-    )
-    unique_player_names = np.concatenate((["Select a player"], unique_player_names))
+    player_index = context["player_index"]
 
-    active_players_df = (
-        pd.concat(
-            [
-                matches_df.groupby(by=["LoserPlayer"])
-                .count()
-                .reset_index(names="Player"),
-                matches_df.groupby(by=["WinnerPlayer"])
-                .count()
-                .reset_index(names="Player"),
-            ]
-        )
-        .groupby(by="Player")
-        .sum()
-        .sort_values(by="matchid", ascending=False)
-        .reset_index()[["Player", "WinnerPlayer", "LoserPlayer"]]
-    )
-    active_players_df["TotalMatches"] = (
-        active_players_df["WinnerPlayer"] + active_players_df["LoserPlayer"]
-    )
-    active_players_df[["WinnerPlayer", "LoserPlayer"]] = active_players_df[
-        ["LoserPlayer", "WinnerPlayer"]
-    ]
+    profile_store = context["profiles"]
+    player_network = context["player_network"]
 
-    player_1_name = player_1_selection_container.selectbox(
-        label="Player 1", options=unique_player_names, key="player_1_selection"
+    player_1_name = player_selector(
+        player_1_selection_container, player_index, "Player 1", "player_1_selection"
     )
-    player_2_name = player_2_selection_container.selectbox(
-        label="Player 2", options=unique_player_names, key="player_2_selection"
+    player_2_name = player_selector(
+        player_2_selection_container, player_index, "Player 2", "player_2_selection"
     )
     player_1_ok = False
     player_2_ok = False
@@ -819,6 +965,8 @@ def player_vs_player(st_lib: ModuleType, **state: dict) -> None:
         if (player_1_name != "Select a player") and (
             player_2_name != "Select a player"
         ):
+            profile_1 = profile_store.profile(player_1_name)
+            profile_2 = profile_store.profile(player_2_name)
             data = {
                 "Name": [
                     player_1_name,
@@ -863,68 +1011,20 @@ def player_vs_player(st_lib: ModuleType, **state: dict) -> None:
                     .values.tolist()[0],
                 ],
                 "Matches": [
-                    int(
-                        active_players_df.loc[
-                            active_players_df["Player"] == player_1_name
-                        ]["TotalMatches"].values.tolist()[0]
-                    ),
-                    int(
-                        active_players_df.loc[
-                            active_players_df["Player"] == player_2_name
-                        ]["TotalMatches"].values.tolist()[0]
-                    ),
+                    int(profile_1.stats["Matches"]),
+                    int(profile_2.stats["Matches"]),
                 ],
                 "Wins": [
-                    int(
-                        active_players_df.loc[
-                            active_players_df["Player"] == player_1_name
-                        ]["WinnerPlayer"].values.tolist()[0]
-                    ),
-                    int(
-                        active_players_df.loc[
-                            active_players_df["Player"] == player_2_name
-                        ]["WinnerPlayer"].values.tolist()[0]
-                    ),
+                    int(profile_1.stats["Wins"]),
+                    int(profile_2.stats["Wins"]),
                 ],
                 "Losses": [
-                    int(
-                        active_players_df.loc[
-                            active_players_df["Player"] == player_1_name
-                        ]["LoserPlayer"].values.tolist()[0]
-                    ),
-                    int(
-                        active_players_df.loc[
-                            active_players_df["Player"] == player_2_name
-                        ]["LoserPlayer"].values.tolist()[0]
-                    ),
+                    int(profile_1.stats["Losses"]),
+                    int(profile_2.stats["Losses"]),
                 ],
                 "Win Percentage": [
-                    round(
-                        100
-                        * int(
-                            active_players_df.loc[
-                                active_players_df["Player"] == player_1_name
-                            ]["WinnerPlayer"].values.tolist()[0]
-                        )
-                        / int(
-                            active_players_df.loc[
-                                active_players_df["Player"] == player_1_name
-                            ]["TotalMatches"].values.tolist()[0]
-                        )
-                    ),
-                    round(
-                        100
-                        * int(
-                            active_players_df.loc[
-                                active_players_df["Player"] == player_2_name
-                            ]["WinnerPlayer"].values.tolist()[0]
-                        )
-                        / int(
-                            active_players_df.loc[
-                                active_players_df["Player"] == player_2_name
-                            ]["TotalMatches"].values.tolist()[0]
-                        )
-                    ),
+                    int(profile_1.stats["Win Percentage"]),
+                    int(profile_2.stats["Win Percentage"]),
                 ],
             }
             comparison_container = st_lib.container()
@@ -950,10 +1050,275 @@ def player_vs_player(st_lib: ModuleType, **state: dict) -> None:
             )
             comparison_container.markdown("---")
 
+            head_to_head_container = st_lib.container()
+            head_to_head_container.markdown("### Head-to-head matches")
+            head_to_head_df = head_to_head_matches(
+                context, player_1_name, player_2_name
+            )
+            if len(head_to_head_df) > 0:
+                head_to_head_container.dataframe(
+                    head_to_head_df[
+                        [
+                            "MatchDatePandas",
+                            "TournamentName",
+                            "WinnerPlayer",
+                            "Score_Short",
+                            "MatchDuration",
+                        ]
+                    ].rename(
+                        columns={
+                            "MatchDatePandas": "Date",
+                            "TournamentName": "Tournament",
+                            "WinnerPlayer": "Winner",
+                            "Score_Short": "Score",
+                            "MatchDuration": "Minutes",
+                        }
+                    ),
+                    use_container_width=True,
+                )
+            else:
+                head_to_head_container.info("The players have not met.")
+            head_to_head_container.markdown("### Common opponents")
+            common_opponents_df = player_network.common_opponents(
+                player_1_name, player_2_name
+            )
+            if len(common_opponents_df) > 0:
+                head_to_head_container.dataframe(
+                    common_opponents_df, use_container_width=True
+                )
+            else:
+                head_to_head_container.info("The players have no common opponents.")
+            head_to_head_container.markdown("### Chains of wins")
+            for winner_name, loser_name in [
+                (player_1_name, player_2_name),
+                (player_2_name, player_1_name),
+            ]:
+                win_path = player_network.win_path(winner_name, loser_name)
+                if win_path:
+                    head_to_head_container.markdown(
+                        " beat ".join(f"**{name}**" for name in win_path)
+                    )
+                else:
+                    head_to_head_container.markdown(
+                        f"There is no chain of wins from **{winner_name}** to **{loser_name}**."
+                    )
+            head_to_head_container.markdown("---")
+
+            profile_container = st_lib.container()
+            profile_container.markdown("### Player profiles")
+            for tab, profile in zip(
+                profile_container.tabs([player_1_name, player_2_name]),
+                [profile_1, profile_2],
+            ):
+                player_profile_panels(tab, profile, player_network)
+
+
+def head_to_head_matches(context: DataContext, first: str, second: str) -> pd.DataFrame:
+    # The match store only holds the latest snapshot, where only the
+    # partitions with matches of the players are read.
+    if config_file.data["as_of"] is None:
+        matches_df = query_matches(players=[first, second], ngb_id=context.partition)
+    else:
+        matches_df = context["matches"]
+    home_names = matches_df["hPlayerName"]
+    visitor_names = matches_df["vPlayerName"]
+    return matches_df.loc[
+        ((home_names == first) & (visitor_names == second))
+        | ((home_names == second) & (visitor_names == first))
+    ].sort_values(by="MatchDatePandas", ascending=False, kind="stable")
+
+
+def player_profile_panels(
+    container: ModuleType, profile: PlayerProfile, player_network: PlayerNetwork
+) -> None:
+    stats = profile.stats
+    container.markdown(
+        f"""
+        Played **{stats["Matches"]} matches** in **{stats["Tournaments"]} tournaments** against **{stats["Opponents"]} opponents** between {stats["First"].date()} and {stats["Last"].date()}.
+        Won **{stats["GamesWon"]} games** and lost **{stats["GamesLost"]} games**, playing **{stats["Rallies"]} rallies** in **{round(stats["Minutes"] / 60)} hours**.
+        """
+    )
+    current_streak = stats["CurrentStreak"]
+    container.markdown(
+        f"""
+        #### Recent form
+        Current streak is **{abs(current_streak)} {"wins" if current_streak > 0 else "losses"}**. The longest winning streak is **{stats["LongestWinStreak"]} wins** and the longest losing streak **{stats["LongestLosingStreak"]} losses**.
+        The chart shows the win rate and the average rally differential over the last {FORM_WINDOW} matches.
+        """
+    )
+    form_df = profile.form.set_index("MatchDatePandas")
+    container.line_chart(form_df[["RollingWinRate"]])
+    container.line_chart(form_df[["RollingRallyDifferential"]])
+    games = profile.games
+    container.markdown(
+        f"""
+        #### Games
+        Wins **{int(games["Tie-Break Wins"])} of {int(games["Tie-Breaks"])} tie-breaks** and came back to win **{int(games["Comebacks"])} of {int(games["Down 0-2"])} matches** from 0-2 down. The average point margin per game is **{games["Average Margin"]:+.1f}**.
+        The chart shows the win percentage of each game of a match.
+        """
+    )
+    container.bar_chart(games[[f"Game {game}" for game in range(1, GAMES + 1)]])
+    container.markdown("#### Matches and wins by year")
+    container.bar_chart(profile.yearly[["Matches", "Wins"]])
+    container.markdown("#### Opponents")
+    container.dataframe(
+        profile.opponents[["Matches", "Wins", "Losses", "Win Percentage"]],
+        use_container_width=True,
+    )
+    container.markdown("#### Tournaments")
+    container.dataframe(
+        profile.tournaments.reset_index(level="TournamentID", drop=True)[
+            ["Matches", "Wins", "Losses"]
+        ],
+        use_container_width=True,
+    )
+    container.markdown("#### Match scores")
+    container.dataframe(profile.scores[["Matches"]], use_container_width=True)
+
+    network_stats = player_network.players.iloc[player_network.player_id(profile.name)]
+    container.markdown(
+        f"""
+        #### Network
+        Belongs to player pool **{network_stats["Component"]}**. Ranks **#{network_stats["OpponentsRank"]}** by the number of different opponents and **#{network_stats["CentralityRank"]}** by centrality in the player network.
+        """
+    )
+    neighborhood_graph = player_network.neighborhood_graph(profile.name)
+    if neighborhood_graph is not None:
+        container.graphviz_chart(neighborhood_graph)
+        container.download_button(
+            label="Download the network (DOT)",
+            data=neighborhood_graph.source,
+            file_name=f"{profile.name}.gv",
+            mime="text/vnd.graphviz",
+            key=f"{profile.name}_network_download",
+        )
+
+
+def player_selector(
+    container: ModuleType, player_index: PlayerSearchIndex, label: str, key: str
+) -> str:
+    # Only the candidates matching the search are sent to the selectbox. The
+    # current selection is kept among them, so a new search does not reset it,
+    # unless the player is not in the index any more after a change of
+    # federation or snapshot.
+    if streamlit.session_state.get(key) not in (None, "Select a player") and (
+        streamlit.session_state[key] not in player_index
+    ):
+        del streamlit.session_state[key]
+    query = container.text_input(
+        label=f"Search {label.lower()}",
+        placeholder="Type a name",
+        key=f"{key}_query",
+    )
+    candidates = player_index.search(query)
+    selected = streamlit.session_state.get(key)
+    if selected not in (None, "Select a player") and selected not in candidates:
+        candidates = [selected] + candidates
+    return container.selectbox(
+        label=label, options=["Select a player"] + candidates, key=key
+    )
+
+
+def selected_federation() -> int:
+    return streamlit.session_state.get("federation", config_file.data["federation"])
+
+
+def federation_selector(sidebar: ModuleType) -> None:
+    federations = config_file.data["federations"]
+    if len(federations) > 1:
+        sidebar.selectbox(
+            "Federation",
+            list(federations),
+            index=list(federations).index(config_file.data["federation"]),
+            format_func=lambda ngb_id: federations[ngb_id]["name"],
+            key="federation",
+        )
+        sidebar.write("---")
+
 
 app = MultiPage(navbar_style="SelectBox", hide_navigation=True)
 app.st = streamlit
 
+app.navbar_extra = federation_selector
+app.partition = selected_federation
+app.snapshot = lambda: get_snapshot_key(
+    skip=config_file.data["skip_fetch"],
+    ngb_id=selected_federation(),
+    as_of=config_file.data["as_of"],
+)
+app.add_provider(
+    "tournaments",
+    lambda context: load_tournaments(
+        skip=config_file.data["skip_fetch"],
+        ngb_id=context.partition,
+        history_start=config_file.data["history_start"],
+        as_of=config_file.data["as_of"],
+    ),
+)
+app.add_provider(
+    "matches",
+    lambda context: load_matches(
+        skip=config_file.data["skip_fetch"],
+        tournaments_df=context["tournaments"],
+        ngb_id=context.partition,
+        as_of=config_file.data["as_of"],
+    ),
+)
+app.add_provider(
+    "rankings",
+    lambda context: load_rankings(
+        skip=config_file.data["skip_fetch"],
+        ngb_id=context.partition,
+        ranking_group=config_file.data["federations"][context.partition][
+            "ranking_group"
+        ],
+        ranking_divisions=config_file.data["federations"][context.partition][
+            "ranking_divisions"
+        ],
+        as_of=config_file.data["as_of"],
+    ),
+)
+app.add_provider(
+    "active_players",
+    lambda context: active_players_aggregate(context["matches"], context.partition),
+)
+app.add_provider(
+    "common_matchups",
+    lambda context: common_matchups_aggregate(context["matches"], context.partition),
+)
+app.add_provider("player_network", lambda context: PlayerNetwork(context["matches"]))
+app.add_provider(
+    "court_utilization", lambda context: court_utilization(context["matches"])
+)
+app.add_provider("game_scores", lambda context: score_tensor(context["matches"]))
+app.add_provider(
+    "profiles",
+    lambda context: PlayerProfileStore(context["matches"], context["game_scores"]),
+)
+app.add_provider("player_index", lambda context: PlayerSearchIndex(context["matches"]))
+app.add_provider(
+    "summary",
+    lambda context: get_snapshot_summary(
+        {
+            dataset: get_snapshot_entry(
+                dataset, as_of=config_file.data["as_of"], ngb_id=context.partition
+            )
+            for dataset in DATASETS
+        },
+        lambda: summarize(
+            context["tournaments"], context["matches"], context["rankings"]
+        ),
+        ngb_id=context.partition,
+    ),
+)
+app.add_provider(
+    "cube",
+    lambda context: AnalyticsCube(
+        match_cube_aggregate(context["matches"], context.partition),
+        tournament_cube_aggregate(context["tournaments"], context.partition),
+    ),
+)
+
 app.add_app("Tournament Data Study", data_analysis)
 app.add_app("Player vs. Player Analyzer", player_vs_player)
 
@@ -5,4 +5,16 @@ display = dict(
 
 data = dict(
     skip_fetch=True,
+    # Load the snapshots as of this date (dt.date) instead of the latest ones.
+    as_of=None,
+    # Federations by Club Locker national governing body (ngbId), with the
+    # ranking group of their national rankings and the divisions of the group
+    # to fetch. Each one is stored in its own data partition.
+    federations={
+        10142: dict(name="Finland", ranking_group=9, ranking_divisions=[2, 1]),
+    },
+    # Federation shown when a session starts.
+    federation=10142,
+    # Tournament listings are walked in date windows starting from this date.
+    history_start="2010-01-01",
 )
@@ -1,9 +1,28 @@
+import atexit
+import copy
+import os
+import tempfile
+import threading
+import time
 from collections import defaultdict
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable, ClassVar, Dict, List, NamedTuple, Union
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    NamedTuple,
+    Tuple,
+    Union,
+)
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 try:
     import joblib
@@ -14,22 +33,46 @@ except ImportError:
 
     pickling = pickle
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 @dataclass
 class StateManager:
     path: Path = Path(__file__).resolve().parent
     cache: Path = path / "cache"
     cache_filename: str = "data.pkl"
+    flush_interval: float = 5.0
+    # Sessions idle for longer are dropped from memory and their files removed.
+    session_ttl: float = 24 * 60 * 60
+    eviction_interval: float = 5 * 60
+    _sessions: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    _last_access: Dict[str, float] = field(default_factory=dict)
+    _dirty_sessions: set = field(default_factory=set)
+    _last_flush: float = field(default_factory=time.monotonic)
+    _last_eviction: float = field(default_factory=time.monotonic)
+    _lock: threading.RLock = field(default_factory=threading.RLock)
+
+    def __post_init__(self) -> None:
+        atexit.register(self.flush, True)
 
     @property
     def cache_file(self) -> Path:
         return self.cache / self.cache_filename
 
+    @property
+    def session_cache_dir(self) -> Path:
+        return self.cache / Path(self.cache_filename).stem
+
     def change_page(self, page: int) -> None:
+        if self._session_data()["global"].get("current_page") == page:
+            return
         self.save({"current_page": page}, ["global"])
 
     def _read_page(self) -> int:
-        data = self._load()["global"]
+        data = self._session_data()["global"]
 
         if "current_page" in data:
             return int(data["current_page"])
@@ -47,28 +90,132 @@ class StateManager:
         if not variables:
             return
 
-        data = self._load()
+        data = self._session_data()
 
-        new_data = {namespace: variables for namespace in namespaces}
-
-        for namespace, variables in new_data.items():
-            if namespace in data:
-                data[namespace].update(variables)
+        for namespace in namespaces:
+            data[namespace].update(variables)
+
+        self._mark_dirty()
+
+    def _session_id(self) -> str:
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return "default"
+        return ctx.session_id
+
+    def _session_file(self, session_id: str) -> Path:
+        return self.session_cache_dir / f"{session_id}.pkl"
+
+    def _session_data(self) -> Dict[str, Any]:
+        session_id = self._session_id()
+        with self._lock:
+            if session_id not in self._sessions:
+                self._sessions[session_id] = self._read_file(
+                    self._session_file(session_id)
+                )
+            self._last_access[session_id] = time.monotonic()
+            return self._sessions[session_id]
+
+    def _mark_dirty(self) -> None:
+        with self._lock:
+            self._dirty_sessions.add(self._session_id())
+
+    def flush(self, force: bool = False) -> None:
+        with self._lock:
+            if not self._dirty_sessions:
+                return
+            if not force and time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            # The data is copied while locked, since the scripts of the
+            # sessions keep changing it while it is written.
+            dirty_sessions = {
+                session_id: copy.deepcopy(dict(self._sessions[session_id]))
+                for session_id in self._dirty_sessions
+                if session_id in self._sessions
+            }
+            self._dirty_sessions.clear()
+            self._last_flush = time.monotonic()
+
+        for session_id, data in dirty_sessions.items():
+            self._write_file(self._session_file(session_id), data)
+
+    def evict_expired(self, force: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_eviction < self.eviction_interval:
+                return
+            self._last_eviction = now
+            expired = [
+                session_id
+                for session_id, last_access in self._last_access.items()
+                if now - last_access > self.session_ttl
+            ]
+            for session_id in expired:
+                self._sessions.pop(session_id, None)
+                self._last_access.pop(session_id, None)
+                self._dirty_sessions.discard(session_id)
+            active = set(self._sessions)
+
+        for session_id in expired:
+            self._remove_session_file(session_id)
+        # Files of sessions from earlier server runs are only known by their
+        # modification time.
+        if not self.session_cache_dir.exists():
+            return
+        for file_path in self.session_cache_dir.glob("*.pkl"):
+            if file_path.stem in active:
                 continue
+            try:
+                modified = file_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if time.time() - modified > self.session_ttl:
+                self._remove_session_file(file_path.stem)
+
+    def _remove_session_file(self, session_id: str) -> None:
+        file_path = self._session_file(session_id)
+        file_path.unlink(missing_ok=True)
+        file_path.with_suffix(".lock").unlink(missing_ok=True)
+
+    @contextmanager
+    def _file_lock(self, file_path: Path, exclusive: bool) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path.with_suffix(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_file(self, file_path: Path, data: Dict[str, Any]) -> None:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._file_lock(file_path, exclusive=True):
+            file_descriptor, temporary_path = tempfile.mkstemp(
+                dir=file_path.parent, suffix=".tmp"
+            )
+            os.close(file_descriptor)
+            try:
+                pickling.dump(dict(data), temporary_path)
+                os.replace(temporary_path, file_path)
+            finally:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+
+    def _read_file(self, file_path: Path) -> Dict[str, Any]:
+        data = defaultdict(dict)
+        if not file_path.exists():
+            return data
+
+        with self._file_lock(file_path, exclusive=False):
+            data.update(pickling.load(file_path))
 
-            data[namespace] = variables
-
-        self._save(data)
-
-    def _save(self, data: Dict[str, Any]) -> None:
-        self.cache.mkdir(parents=True, exist_ok=True)
-        pickling.dump(data, self.cache_file)
+        return data
 
     def _load(self) -> Dict[str, Any]:
-        if not self.cache_file.exists():
-            return defaultdict(dict)
-
-        data = pickling.load(self.cache_file)
+        data = dict(self._session_data())
         if "global" in data:
             data.update(data["global"])
 
@@ -84,10 +231,15 @@ class StateManager:
             return
 
         if all_variables:
-            self.cache_file.unlink(missing_ok=True)
+            session_id = self._session_id()
+            with self._lock:
+                self._sessions.pop(session_id, None)
+                self._last_access.pop(session_id, None)
+                self._dirty_sessions.discard(session_id)
+            self._remove_session_file(session_id)
             return
 
-        data = self._load()
+        data = self._session_data()
         for namespace in namespaces:
             for variable in variables:
                 if variable not in data[namespace]:
@@ -95,7 +247,7 @@ class StateManager:
 
                 del data[namespace][variable]
 
-        self._save(data)
+        self._mark_dirty()
 
 
 state = StateManager()
@@ -106,6 +258,65 @@ class App(NamedTuple):
     func: Callable
 
 
+class DataContext:
+    # Resolved values are shared by all sessions and pages of the process. Each
+    # partition keeps the values of its own snapshot, which are dropped when the
+    # snapshot key of that partition changes.
+    _values: ClassVar[Dict[Tuple[Hashable, Hashable, str], Any]] = {}
+    _locks: ClassVar[Dict[Tuple[Hashable, Hashable, str], threading.Lock]] = {}
+    _snapshots: ClassVar[Dict[Hashable, Hashable]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(
+        self,
+        providers: Dict[str, Callable],
+        snapshot: Hashable,
+        partition: Hashable = None,
+    ) -> None:
+        self._providers = providers
+        self.snapshot = snapshot
+        self.partition = partition
+
+        with self._lock:
+            if partition not in DataContext._snapshots or (
+                DataContext._snapshots[partition] != snapshot
+            ):
+                DataContext._values = {
+                    key: value
+                    for key, value in DataContext._values.items()
+                    if key[0] != partition
+                }
+                DataContext._locks = {
+                    key: lock
+                    for key, lock in DataContext._locks.items()
+                    if key[0] != partition
+                }
+                DataContext._snapshots[partition] = snapshot
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._providers:
+            raise KeyError(f"No data provider registered for '{name}'.")
+
+        key = (self.partition, self.snapshot, name)
+        if key in self._values:
+            return self._values[key]
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self._values:
+                self._values[key] = self._providers[name](self)
+
+        return self._values[key]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._providers
+
+    def is_resolved(self, name: str) -> bool:
+        return (self.partition, self.snapshot, name) in self._values
+
+
 @dataclass
 class MultiPage:
     st = None
@@ -123,6 +334,9 @@ class MultiPage:
     __header: App = None
     __footer: App = None
     __navbar_extra: App = None
+    __providers: Dict[str, Callable] = field(default_factory=dict)
+    __snapshot: Callable = None
+    __partition: Callable = None
 
     @property
     def header(self) -> App:
@@ -148,6 +362,25 @@ class MultiPage:
     def navbar_extra(self, value: Callable) -> None:
         self.__navbar_extra = App("Navbar_extra", value)
 
+    @property
+    def snapshot(self) -> Callable:
+        return self.__snapshot
+
+    @snapshot.setter
+    def snapshot(self, value: Callable) -> None:
+        self.__snapshot = value
+
+    @property
+    def partition(self) -> Callable:
+        return self.__partition
+
+    @partition.setter
+    def partition(self, value: Callable) -> None:
+        self.__partition = value
+
+    def add_provider(self, name: str, func: Callable) -> None:
+        self.__providers[name] = func
+
     def add_app(self, name: str, func: Callable, initial_page: bool = False) -> None:
         if initial_page:
             self.__initial_page = App("__INITIALPAGE__", func)
@@ -267,6 +500,14 @@ class MultiPage:
         if app.name in data:
             data = data[app.name]
 
+        if self.__providers:
+            snapshot = self.snapshot() if self.snapshot else None
+            partition = self.partition() if self.partition else None
+            data = {
+                **data,
+                "context": DataContext(self.__providers, snapshot, partition),
+            }
+
         app.func(self.st, **data)
 
         if self.footer:
@@ -284,6 +525,8 @@ class MultiPage:
             self.__state_manager.cache_filename = cache_filename
 
         self._run()
+        self.__state_manager.flush()
+        self.__state_manager.evict_expired()
 
     @classmethod
     def clear_cache(
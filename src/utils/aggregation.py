@@ -0,0 +1,142 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import pandas as pd
+
+from utils.diff import SnapshotDiff, diff_snapshots
+
+
+class IncrementalAggregate:
+    # Keeps the last source frame and its aggregate per partition, so that the
+    # aggregate of the next snapshot can be updated from the diff between the two.
+    def __init__(self, compute: Callable, update: Callable, keys: list) -> None:
+        self.compute = compute
+        self.update = update
+        self.keys = keys
+        self._states: Dict[Hashable, Tuple[pd.DataFrame, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, source_df: pd.DataFrame, partition: Hashable = None):
+        with self._lock:
+            previous_source, previous_aggregate = self._states.get(
+                partition, (None, None)
+            )
+            if previous_source is source_df:
+                return previous_aggregate
+            aggregate = None
+            if previous_source is not None:
+                try:
+                    diff = diff_snapshots(previous_source, source_df, self.keys)
+                    aggregate = self.update(previous_aggregate, diff)
+                except ValueError:
+                    aggregate = None
+            if aggregate is None:
+                aggregate = self.compute(source_df)
+            self._states[partition] = (source_df, aggregate)
+            return aggregate
+
+
+def get_active_players(matches_df: pd.DataFrame) -> pd.DataFrame:
+    active_players_df = (
+        pd.concat(
+            [
+                matches_df.groupby(by=["LoserPlayer"])
+                .count()
+                .reset_index(names="Player"),
+                matches_df.groupby(by=["WinnerPlayer"])
+                .count()
+                .reset_index(names="Player"),
+            ]
+        )
+        .groupby(by="Player")
+        .sum()
+        .sort_values(by="matchid", ascending=False)
+        .reset_index()[["Player", "WinnerPlayer", "LoserPlayer"]]
+    )
+    active_players_df["TotalMatches"] = (
+        active_players_df["WinnerPlayer"] + active_players_df["LoserPlayer"]
+    )
+    active_players_df[["WinnerPlayer", "LoserPlayer"]] = active_players_df[
+        ["LoserPlayer", "WinnerPlayer"]
+    ]
+    return active_players_df
+
+
+def update_active_players(
+    active_players_df: pd.DataFrame, matches_diff: SnapshotDiff
+) -> pd.DataFrame:
+    added_df, removed_df = _added_and_removed(matches_diff)
+    change_df = pd.DataFrame(
+        {
+            "WinnerPlayer": added_df["WinnerPlayer"]
+            .value_counts()
+            .sub(removed_df["WinnerPlayer"].value_counts(), fill_value=0),
+            "LoserPlayer": added_df["LoserPlayer"]
+            .value_counts()
+            .sub(removed_df["LoserPlayer"].value_counts(), fill_value=0),
+        }
+    )
+    players_df = (
+        active_players_df.set_index("Player")[["WinnerPlayer", "LoserPlayer"]]
+        .add(change_df, fill_value=0)
+        .fillna(0)
+        .astype(int)
+    )
+    players_df["TotalMatches"] = players_df["WinnerPlayer"] + players_df["LoserPlayer"]
+    return (
+        players_df.loc[players_df["TotalMatches"] > 0]
+        .sort_values(by="TotalMatches", ascending=False)
+        .reset_index(names="Player")
+    )
+
+
+def get_common_matchups(matches_df: pd.DataFrame) -> pd.DataFrame:
+    common_matchups_df = (
+        matches_df.groupby(by=["WinnerPlayer", "LoserPlayer"])
+        .count()
+        .sort_values(by="matchid", ascending=False)
+        .reset_index(names=["Player1", "Player2"])[["Player1", "Player2", "matchid"]]
+    )
+    common_matchups_df["Matchup"] = common_matchups_df["Player1"].str.cat(
+        common_matchups_df["Player2"], sep=" vs. "
+    )
+    return common_matchups_df
+
+
+def update_common_matchups(
+    common_matchups_df: pd.DataFrame, matches_diff: SnapshotDiff
+) -> pd.DataFrame:
+    added_df, removed_df = _added_and_removed(matches_diff)
+    pair_columns = ["WinnerPlayer", "LoserPlayer"]
+    matchup_counts = (
+        common_matchups_df.set_index(["Player1", "Player2"])["matchid"]
+        .rename_axis(pair_columns)
+        .add(added_df.groupby(by=pair_columns).size(), fill_value=0)
+        .sub(removed_df.groupby(by=pair_columns).size(), fill_value=0)
+        .astype(int)
+    )
+    common_matchups_df = (
+        matchup_counts.loc[matchup_counts > 0]
+        .sort_values(ascending=False)
+        .reset_index(name="matchid")
+        .rename(columns={"WinnerPlayer": "Player1", "LoserPlayer": "Player2"})
+    )
+    common_matchups_df["Matchup"] = common_matchups_df["Player1"].str.cat(
+        common_matchups_df["Player2"], sep=" vs. "
+    )
+    return common_matchups_df
+
+
+def _added_and_removed(diff: SnapshotDiff) -> tuple:
+    added_df = pd.concat([diff.inserted, diff.updated])
+    removed_df = pd.concat([diff.previous, diff.deleted])
+    return added_df, removed_df
+
+
+# Module level, so that the previous snapshot survives Streamlit reruns.
+active_players_aggregate = IncrementalAggregate(
+    get_active_players, update_active_players, keys=["matchid"]
+)
+common_matchups_aggregate = IncrementalAggregate(
+    get_common_matchups, update_common_matchups, keys=["matchid"]
+)
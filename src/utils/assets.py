@@ -0,0 +1,58 @@
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+STATIC_URL = "app/static"
+
+# Source image and the width it is displayed at. Backgrounds are stretched with
+# "background-size: cover", headers are shown in a 4/6 wide column.
+ASSETS = {
+    "neon_court2": {"source": "res/neon_court2.png", "width": 1024},
+    "neon_court4": {"source": "res/neon_court4.png", "width": 1024},
+    "court3": {"source": "res/court3.png", "width": 1200},
+    "court4": {"source": "res/court4.png", "width": 1200},
+}
+ASSET_FORMATS = {
+    "webp": {"format": "WEBP", "options": {"quality": 75, "method": 6}},
+    "jpg": {"format": "JPEG", "options": {"quality": 80, "optimize": True}},
+}
+
+
+def static_asset_path(name: str, extension: str) -> Path:
+    return STATIC_DIR / f"{name}.{extension}"
+
+
+def static_asset_url(name: str, extension: str) -> str:
+    return f"{STATIC_URL}/{name}.{extension}"
+
+
+def is_asset_built(name: str) -> bool:
+    return all(
+        static_asset_path(name, extension).exists() for extension in ASSET_FORMATS
+    )
+
+
+def build_static_assets(force: bool = False) -> list:
+    if Image is None:
+        raise ImportError("Building static assets requires Pillow.")
+    STATIC_DIR.mkdir(parents=True, exist_ok=True)
+    built_paths = []
+    for name, asset in ASSETS.items():
+        if is_asset_built(name) and not force:
+            continue
+        with Image.open(asset["source"]) as image:
+            image = image.convert("RGB")
+            if image.width > asset["width"]:
+                height = round(image.height * asset["width"] / image.width)
+                image = image.resize((asset["width"], height), Image.LANCZOS)
+            for extension, asset_format in ASSET_FORMATS.items():
+                target_path = static_asset_path(name, extension)
+                image.save(
+                    target_path, asset_format["format"], **asset_format["options"]
+                )
+                built_paths.append(target_path)
+    return built_paths
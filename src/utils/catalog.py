@@ -0,0 +1,303 @@
+import bisect
+import datetime as dt
+import glob
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DATA_DIR = Path("data")
+CATALOG_FILE_NAME = "catalog.json"
+CATALOG_VERSION = 2
+# Snapshots are partitioned by federation (Club Locker ngbId). The first
+# federation predates the partitioning, so its partition is the data
+# directory itself and the other federations live in subdirectories.
+ROOT_PARTITION_NGB_ID = 10142
+DATASETS = ["tournaments", "matches", "rankings"]
+# Bump a dataset's version whenever the columns written by its fetcher change.
+SCHEMA_VERSIONS = {"tournaments": 1, "matches": 1, "rankings": 1}
+
+# Catalogs by partition, with the modification time and size of the file they
+# were read from. The catalog is re-read when another process has written it.
+_catalogs: Dict[int, Tuple[Optional[Tuple[int, int]], dict]] = {}
+_catalog_lock = threading.RLock()
+
+
+def partition_dir(ngb_id: int = ROOT_PARTITION_NGB_ID) -> Path:
+    if ngb_id == ROOT_PARTITION_NGB_ID:
+        return DATA_DIR
+    return DATA_DIR / f"ngb_{ngb_id}"
+
+
+def catalog_path(ngb_id: int = ROOT_PARTITION_NGB_ID) -> Path:
+    return partition_dir(ngb_id) / CATALOG_FILE_NAME
+
+
+def load_catalog(ngb_id: int = ROOT_PARTITION_NGB_ID) -> dict:
+    with _catalog_lock:
+        file_stamp = _file_stamp(ngb_id)
+        cached = _catalogs.get(ngb_id)
+        if cached is not None and file_stamp is not None and cached[0] == file_stamp:
+            return cached[1]
+        catalog = _read_catalog(ngb_id)
+        if catalog is None:
+            return rebuild_catalog(ngb_id)
+        _catalogs[ngb_id] = (file_stamp, catalog)
+        return catalog
+
+
+def reload_catalog(ngb_id: int = ROOT_PARTITION_NGB_ID) -> dict:
+    with _catalog_lock:
+        _catalogs.pop(ngb_id, None)
+        return load_catalog(ngb_id)
+
+
+def rebuild_catalog(ngb_id: int = ROOT_PARTITION_NGB_ID) -> dict:
+    with _catalog_lock, _catalog_file_lock(ngb_id):
+        return _build_catalog(ngb_id)
+
+
+def register_snapshot(
+    dataset: str,
+    snapshot_date: dt.date,
+    file_name: str,
+    rows: int,
+    source: str = "clublocker",
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+    **metadata,
+) -> dict:
+    with _updated_catalog(ngb_id) as catalog:
+        entry = _add_entry(
+            catalog, ngb_id, dataset, snapshot_date, file_name, rows, source, **metadata
+        )
+        _update_chain_lengths(catalog)
+    return entry
+
+
+def remove_snapshot(
+    dataset: str, snapshot_date: dt.date, ngb_id: int = ROOT_PARTITION_NGB_ID
+) -> Optional[dict]:
+    with _updated_catalog(ngb_id) as catalog:
+        entry = catalog["snapshots"].get(dataset, {}).pop(str(snapshot_date), None)
+        if entry is not None:
+            dates = sorted(catalog["snapshots"][dataset])
+            catalog["latest"][dataset] = dates[-1] if dates else None
+            catalog.get("summaries", {}).pop(str(snapshot_date), None)
+            _update_chain_lengths(catalog)
+    return entry
+
+
+def latest_snapshot_date(
+    dataset: str, ngb_id: int = ROOT_PARTITION_NGB_ID
+) -> Optional[dt.date]:
+    latest = load_catalog(ngb_id)["latest"].get(dataset)
+    if latest is None:
+        return None
+    return dt.date.fromisoformat(latest)
+
+
+def get_snapshot_entry(
+    dataset: str,
+    as_of: Optional[dt.date] = None,
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> Optional[dict]:
+    catalog = load_catalog(ngb_id)
+    snapshots = catalog["snapshots"].get(dataset, {})
+    if as_of is None:
+        latest = catalog["latest"].get(dataset)
+        return snapshots.get(latest) if latest else None
+    dates = sorted(snapshots)
+    index = bisect.bisect_right(dates, str(as_of))
+    if index == 0:
+        return None
+    return snapshots[dates[index - 1]]
+
+
+def snapshot_dates(dataset: str, ngb_id: int = ROOT_PARTITION_NGB_ID) -> list:
+    snapshots = load_catalog(ngb_id)["snapshots"].get(dataset, {})
+    return [dt.date.fromisoformat(date) for date in sorted(snapshots)]
+
+
+def register_summary(
+    summary_date: str, record: dict, ngb_id: int = ROOT_PARTITION_NGB_ID
+) -> None:
+    # Summaries are derived from the snapshots, so they are not restored when
+    # the catalog is rebuilt.
+    with _updated_catalog(ngb_id) as catalog:
+        catalog.setdefault("summaries", {})[summary_date] = record
+
+
+def get_summary_record(
+    summary_date: str, ngb_id: int = ROOT_PARTITION_NGB_ID
+) -> Optional[dict]:
+    return load_catalog(ngb_id).get("summaries", {}).get(summary_date)
+
+
+def file_checksum(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return f"sha256:{digest.hexdigest()}"
+
+
+def _build_catalog(ngb_id: int) -> dict:
+    # Callers hold the lock of the catalog file.
+    catalog = _empty_catalog()
+    data_dir = partition_dir(ngb_id)
+    for dataset in DATASETS:
+        for file_path in sorted(glob.glob(str(data_dir / f"{dataset}_*.pkl"))):
+            snapshot_date = _parse_snapshot_date(file_path)
+            snapshot = pd.read_pickle(file_path)
+            if file_path.endswith(".delta.pkl"):
+                _add_entry(
+                    catalog,
+                    ngb_id,
+                    dataset,
+                    snapshot_date,
+                    Path(file_path).name,
+                    rows=snapshot["rows"],
+                    source="bootstrap",
+                    kind="delta",
+                    parent=snapshot["parent"],
+                    delta_rows=len(snapshot["upserts"]) + len(snapshot["deleted"]),
+                )
+            else:
+                _add_entry(
+                    catalog,
+                    ngb_id,
+                    dataset,
+                    snapshot_date,
+                    Path(file_path).name,
+                    rows=len(snapshot),
+                    source="bootstrap",
+                )
+    _update_chain_lengths(catalog)
+    _save_catalog(catalog, ngb_id)
+    return catalog
+
+
+def _empty_catalog() -> dict:
+    return {
+        "version": CATALOG_VERSION,
+        "latest": {dataset: None for dataset in DATASETS},
+        "snapshots": {dataset: {} for dataset in DATASETS},
+    }
+
+
+def _add_entry(
+    catalog: dict,
+    ngb_id: int,
+    dataset: str,
+    snapshot_date: dt.date,
+    file_name: str,
+    rows: int,
+    source: str,
+    kind: str = "base",
+    parent: Optional[str] = None,
+    **metadata,
+) -> dict:
+    entry = {
+        "dataset": dataset,
+        "date": str(snapshot_date),
+        "file": file_name,
+        "rows": int(rows),
+        "schema_version": SCHEMA_VERSIONS[dataset],
+        "checksum": file_checksum(partition_dir(ngb_id) / file_name),
+        "source": source,
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "kind": kind,
+        "parent": parent,
+        "chain_length": 0,
+        **metadata,
+    }
+    catalog["snapshots"].setdefault(dataset, {})[entry["date"]] = entry
+    latest = catalog["latest"].get(dataset)
+    if latest is None or entry["date"] >= latest:
+        catalog["latest"][dataset] = entry["date"]
+    return entry
+
+
+def _update_chain_lengths(catalog: dict) -> None:
+    # Number of deltas that have to be applied on top of a base to read a snapshot.
+    for snapshots in catalog["snapshots"].values():
+        for date in sorted(snapshots):
+            entry = snapshots[date]
+            parent = snapshots.get(entry.get("parent"))
+            if entry.get("kind", "base") == "base" or parent is None:
+                entry["chain_length"] = 0
+            else:
+                entry["chain_length"] = parent["chain_length"] + 1
+
+
+@contextmanager
+def _updated_catalog(ngb_id: int) -> Iterator[dict]:
+    # Other processes write the catalog as well, so every change is applied to
+    # the file as it is now, while holding the lock of the file.
+    with _catalog_lock, _catalog_file_lock(ngb_id):
+        catalog = _read_catalog(ngb_id)
+        if catalog is None:
+            catalog = _build_catalog(ngb_id)
+        yield catalog
+        _save_catalog(catalog, ngb_id)
+
+
+@contextmanager
+def _catalog_file_lock(ngb_id: int) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    partition_dir(ngb_id).mkdir(parents=True, exist_ok=True)
+    with open(catalog_path(ngb_id).with_suffix(".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _file_stamp(ngb_id: int) -> Optional[Tuple[int, int]]:
+    try:
+        stat = catalog_path(ngb_id).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_catalog(ngb_id: int) -> Optional[dict]:
+    # The file is replaced as a whole when it is written, so it can be read
+    # without the lock. None when it is missing or of an older version.
+    try:
+        with open(catalog_path(ngb_id), "r", encoding="utf-8") as catalog_file:
+            catalog = json.load(catalog_file)
+    except FileNotFoundError:
+        return None
+    if catalog.get("version") != CATALOG_VERSION:
+        return None
+    return catalog
+
+
+def _save_catalog(catalog: dict, ngb_id: int) -> None:
+    partition_dir(ngb_id).mkdir(parents=True, exist_ok=True)
+    path = catalog_path(ngb_id)
+    temporary_path = path.with_name(path.name + ".tmp")
+    with open(temporary_path, "w", encoding="utf-8") as catalog_file:
+        json.dump(catalog, catalog_file, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+    with _catalog_lock:
+        _catalogs[ngb_id] = (_file_stamp(ngb_id), catalog)
+
+
+def _parse_snapshot_date(file_path: str) -> dt.date:
+    date_string = file_path.split("_")[-1].split(".")[0]
+    return dt.datetime.strptime(date_string, "%Y-%m-%d").date()
@@ -0,0 +1,180 @@
+import math
+from array import array
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Columns of the raw API records in the order they are stored in the snapshots,
+# so that a crawled frame can be diffed against the previous snapshot.
+SCHEMAS = {
+    "tournaments": {
+        "TournamentID": "int64",
+        "TournamentContact": "object",
+        "ContactPhone": "object",
+        "ContactEmail": "object",
+        "OrganizerOrganization": "int64",
+        "URL": "object",
+        "FileName": "object",
+        "Entry_Type": "int64",
+        "TournamentName": "object",
+        "StartDate": "object",
+        "Breaks_On": "object",
+        "Resumes_On": "object",
+        "EndDate": "object",
+        "SiteCity": "object",
+        "Entry_Open": "object",
+        "Entry_Close": "object",
+        "Entry_Close_Time": "object",
+        "EarlyBirdRegistrationDeadline": "object",
+        "Registration_Deadline": "object",
+        "Membership_Usage": "object",
+        "events": "object",
+        "VenueId": "int64",
+        "RankingPeriod": "object",
+        "EventType": "object",
+        "EventTypeCode": "int64",
+        "NumPlayers": "int64",
+        "PlayersOnDraw": "int64",
+        "EntryForm": "object",
+        "NumMatches": "int64",
+        "Unsanctioned": "int64",
+        "CreateDate": "object",
+        "UpdateDate": "object",
+        "SeasonID": "int64",
+        "LogoImageUrl": "object",
+        "OrganizerLogoUrl": "object",
+        "StartingTimesID": "int64",
+        "Pictures_URL": "object",
+        "OrganizationLat": "object",
+        "OrganizationLong": "object",
+        "OrganizationDistance": "int64",
+        "VenueName": "object",
+        "Type": "object",
+    },
+    "matches": {
+        "matchid": "int64",
+        "MatchDate": "object",
+        "StartTime": "object",
+        "CourtNumber": "object",
+        "Title": "object",
+        "hPlayerName": "object",
+        "hPartnerName": "object",
+        "vPlayerName": "object",
+        "vPartnerName": "object",
+        "RoundDescr": "object",
+        "SectionDescr": "object",
+        "Score_Short": "object",
+        "SinglesDoubles": "object",
+        "Winner": "object",
+        "Matchstatus": "object",
+        "wset1": "float64",
+        "wset2": "float64",
+        "wset3": "float64",
+        "wset4": "float64",
+        "wset5": "float64",
+        "oset1": "float64",
+        "oset2": "float64",
+        "oset3": "float64",
+        "oset4": "float64",
+        "oset5": "float64",
+        "gameDuration1": "object",
+        "gameDuration2": "object",
+        "gameDuration3": "object",
+        "gameDuration4": "object",
+        "gameDuration5": "object",
+        "matchStart": "object",
+        "matchEnd": "object",
+        "sportId": "int64",
+        "TournamentID": "int64",
+    },
+    "rankings": {
+        "ranking": "int64",
+        "season": "object",
+        "division": "object",
+        "type": "object",
+        "lastName": "object",
+        "firstName": "object",
+        "rating": "float64",
+        "exposures": "object",
+        "city": "object",
+        "state": "object",
+        "location": "object",
+        "profilePictureUrl": "object",
+        "playerId": "int64",
+        "age": "int64",
+        "ageUp": "int64",
+        "dob": "object",
+        "gender": "object",
+        "avgTournaments": "object",
+        "averagedPoints": "float64",
+        "totalPoints": "object",
+        "email": "object",
+        "homeClub": "object",
+    },
+}
+
+_TYPECODES = {"int64": "q", "float64": "d"}
+
+
+class ColumnarAccumulator:
+    # Appends records straight into one buffer per column, so the crawled
+    # records can be dropped as soon as they are read. Numeric columns use
+    # typed arrays and are widened (int to float, anything to object) when a
+    # value does not fit, the same way pandas would infer the column.
+    def __init__(self, schema: Dict[str, str], key: Optional[str] = None) -> None:
+        self.key = key
+        self._buffers = {
+            column: array(_TYPECODES[dtype]) if dtype in _TYPECODES else []
+            for column, dtype in schema.items()
+        }
+        self._seen = set()
+        self._rows = 0
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def append(self, record: dict) -> bool:
+        if self.key is not None:
+            if record.get(self.key) in self._seen:
+                return False
+            self._seen.add(record.get(self.key))
+        for column in record.keys() - self._buffers.keys():
+            self._buffers[column] = [None] * self._rows
+        for column in self._buffers:
+            self._append_value(column, record.get(column))
+        self._rows += 1
+        return True
+
+    def extend(self, records: Iterable[dict]) -> int:
+        return sum(self.append(record) for record in records)
+
+    def to_frame(self) -> pd.DataFrame:
+        # The typed arrays are wrapped without copying, so nothing can be
+        # appended once the frame has been built.
+        columns = {}
+        for column, buffer in self._buffers.items():
+            if isinstance(buffer, array):
+                columns[column] = np.frombuffer(
+                    buffer, dtype=np.int64 if buffer.typecode == "q" else np.float64
+                )
+            else:
+                columns[column] = pd.Series(buffer, dtype=None if buffer else object)
+        return pd.DataFrame(columns)
+
+    def _append_value(self, column: str, value) -> None:
+        buffer = self._buffers[column]
+        if isinstance(buffer, list):
+            buffer.append(value)
+            return
+        typed_value = math.nan if value is None else value
+        try:
+            buffer.append(typed_value)
+        except (TypeError, OverflowError):
+            if buffer.typecode == "q" and isinstance(typed_value, float):
+                buffer = array("d", buffer)
+            else:
+                buffer = [None if math.isnan(x) else x for x in buffer]
+                typed_value = value
+            self._buffers[column] = buffer
+            buffer.append(typed_value)
@@ -0,0 +1,150 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Shorter matches were entered into Club Locker after they were played, so
+# their start and end times say nothing about court use.
+MIN_MATCH_MINUTES = 5
+NANOSECONDS_PER_MINUTE = 60 * 10**9
+
+
+class CourtUtilization(NamedTuple):
+    # Sessions are the days of a tournament. The timeline has the number of
+    # matches in play after each start and end of a match.
+    sessions: pd.DataFrame
+    tournaments: pd.DataFrame
+    timeline: pd.DataFrame
+
+
+def court_utilization(matches_df: pd.DataFrame) -> CourtUtilization:
+    matches_df = matches_df.loc[matches_df["MatchDuration"] >= MIN_MATCH_MINUTES]
+    session_df = pd.DataFrame(
+        {
+            "TournamentID": matches_df["TournamentID"].values,
+            "TournamentName": matches_df["TournamentName"].values,
+            "Day": matches_df["MatchDatePandas"].dt.normalize().values,
+            "Scheduled": matches_df["MatchDatePandas"].values,
+            "CourtNumber": matches_df["CourtNumber"].values,
+            "MatchDuration": matches_df["MatchDuration"].values,
+        }
+    )
+    session_ids = session_df.groupby(by=["TournamentID", "Day"], sort=True).ngroup()
+    session_ids = session_ids.values
+    sessions = int(session_ids.max()) + 1 if len(session_ids) else 0
+
+    # The sweep. Every match is a start event (+1) and an end event (-1).
+    # Sorting by session and time puts the events of a session together, and
+    # ends go before starts at the same moment so that back-to-back matches
+    # do not overlap. Each session adds up to zero, so one cumulative sum over
+    # all events gives the number of matches in play within every session.
+    starts = _utc_nanoseconds(matches_df["matchStart"])
+    ends = _utc_nanoseconds(matches_df["matchEnd"])
+    event_sessions = np.concatenate([session_ids, session_ids])
+    event_times = np.concatenate([starts, ends])
+    event_deltas = np.concatenate(
+        [np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)]
+    )
+    order = np.lexsort((event_deltas, event_times, event_sessions))
+    event_sessions = event_sessions[order]
+    event_times = event_times[order]
+    concurrent = np.cumsum(event_deltas[order])
+
+    # Intervals between consecutive events of the same session, in minutes.
+    same_session = event_sessions[1:] == event_sessions[:-1]
+    interval_sessions = event_sessions[:-1][same_session]
+    interval_minutes = (np.diff(event_times) / NANOSECONDS_PER_MINUTE)[same_session]
+    interval_concurrent = concurrent[:-1][same_session]
+    idle = interval_concurrent == 0
+
+    peak_courts = np.zeros(sessions, dtype=np.int64)
+    np.maximum.at(peak_courts, event_sessions, concurrent)
+    first_event = np.full(sessions, np.iinfo(np.int64).max)
+    last_event = np.full(sessions, np.iinfo(np.int64).min)
+    np.minimum.at(first_event, event_sessions, event_times)
+    np.maximum.at(last_event, event_sessions, event_times)
+    longest_idle_gap = np.zeros(sessions)
+    np.maximum.at(longest_idle_gap, interval_sessions[idle], interval_minutes[idle])
+
+    grouped = session_df.groupby(session_ids)
+    sessions_df = pd.DataFrame(
+        {
+            "TournamentID": grouped["TournamentID"].first().values,
+            "TournamentName": grouped["TournamentName"].first().values,
+            "Day": grouped["Day"].first().values,
+            "Matches": grouped.size().values,
+            "Courts": grouped["CourtNumber"].nunique().values,
+            "PeakCourts": peak_courts,
+            "CourtMinutes": np.bincount(
+                interval_sessions,
+                weights=interval_concurrent * interval_minutes,
+                minlength=sessions,
+            ),
+            "SpanMinutes": (last_event - first_event) / NANOSECONDS_PER_MINUTE,
+            "IdleMinutes": np.bincount(
+                interval_sessions[idle],
+                weights=interval_minutes[idle],
+                minlength=sessions,
+            ),
+            "LongestIdleGap": longest_idle_gap,
+            # The schedule runs from the first to the last scheduled start,
+            # plus a typical match of the day.
+            "ScheduledMinutes": (
+                grouped["Scheduled"].max() - grouped["Scheduled"].min()
+            )
+            .dt.total_seconds()
+            .values
+            / 60
+            + grouped["MatchDuration"].median().values,
+        }
+    )
+    sessions_df["Overrun"] = (
+        sessions_df["SpanMinutes"] - sessions_df["ScheduledMinutes"]
+    )
+    # Utilization is the share of the court time of the session spent playing.
+    sessions_df["CourtSpanMinutes"] = sessions_df["Courts"] * sessions_df["SpanMinutes"]
+    sessions_df["Utilization"] = _utilization(
+        sessions_df["CourtMinutes"], sessions_df["CourtSpanMinutes"]
+    )
+
+    tournaments_df = sessions_df.groupby(by="TournamentID", sort=False).agg(
+        TournamentName=("TournamentName", "first"),
+        Day=("Day", "min"),
+        Days=("Day", "size"),
+        Matches=("Matches", "sum"),
+        Courts=("Courts", "max"),
+        PeakCourts=("PeakCourts", "max"),
+        CourtMinutes=("CourtMinutes", "sum"),
+        CourtSpanMinutes=("CourtSpanMinutes", "sum"),
+        SpanMinutes=("SpanMinutes", "sum"),
+        IdleMinutes=("IdleMinutes", "sum"),
+        LongestIdleGap=("LongestIdleGap", "max"),
+        Overrun=("Overrun", "sum"),
+    )
+    tournaments_df["Utilization"] = _utilization(
+        tournaments_df["CourtMinutes"], tournaments_df["CourtSpanMinutes"]
+    )
+    tournaments_df["AverageConcurrency"] = (
+        tournaments_df["CourtMinutes"] / tournaments_df["SpanMinutes"]
+    )
+    sessions_df = sessions_df.drop(columns="CourtSpanMinutes")
+    tournaments_df = tournaments_df.drop(columns="CourtSpanMinutes")
+
+    timeline_df = pd.DataFrame(
+        {
+            "Session": event_sessions,
+            "Time": pd.to_datetime(event_times),
+            "Concurrent": concurrent,
+        }
+    )
+    return CourtUtilization(sessions_df, tournaments_df, timeline_df)
+
+
+def _utc_nanoseconds(timestamps: pd.Series) -> np.ndarray:
+    return pd.to_datetime(timestamps, utc=True).values.astype(np.int64)
+
+
+def _utilization(court_minutes: pd.Series, available_minutes: pd.Series) -> pd.Series:
+    return (
+        100 * court_minutes / available_minutes.where(available_minutes > 0)
+    ).round()
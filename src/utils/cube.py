@@ -0,0 +1,117 @@
+from typing import List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregation import IncrementalAggregate, _added_and_removed
+from utils.diff import SnapshotDiff
+from utils.extraction import COVID_START_DATE
+
+TIME_DIMENSIONS = ["Year", "Month", "Week", "Weekday", "covid"]
+MATCH_DIMENSIONS = TIME_DIMENSIONS + ["Division"]
+MATCH_MEASURES = ["Matches", "Games", "Rallies", "Minutes"]
+# Tournaments span several divisions, so their measures have no division.
+TOURNAMENT_DIMENSIONS = TIME_DIMENSIONS
+TOURNAMENT_MEASURES = ["Tournaments", "Participants"]
+
+
+class AnalyticsCube(NamedTuple):
+    matches: pd.DataFrame
+    tournaments: pd.DataFrame
+
+    def slice(self, measure: str, by: List[str], **filters) -> pd.Series:
+        # Filters map a dimension to one value or a list of values.
+        cube = self.matches if measure in MATCH_MEASURES else self.tournaments
+        for dimension, values in filters.items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            cube = cube.loc[cube.index.get_level_values(dimension).isin(values)]
+        return cube.groupby(level=by)[measure].sum()
+
+    def table(self, measure: str, index: str, columns: str, **filters) -> pd.DataFrame:
+        return self.slice(measure, [index, columns], **filters).unstack(
+            columns, fill_value=0
+        )
+
+
+def build_cube(tournaments_df: pd.DataFrame, matches_df: pd.DataFrame) -> AnalyticsCube:
+    return AnalyticsCube(
+        get_match_cube(matches_df), get_tournament_cube(tournaments_df)
+    )
+
+
+def get_match_cube(matches_df: pd.DataFrame) -> pd.DataFrame:
+    facts_df = pd.DataFrame(
+        {
+            "Year": matches_df["Year"],
+            "Month": matches_df["Month"],
+            "Week": matches_df["Week"],
+            "Weekday": matches_df["Weekday"],
+            "covid": _covid_era(matches_df["MatchDatePandas"]),
+            "Division": matches_df["Division"],
+            "Matches": 1,
+            "Games": matches_df["NumberOfGames"],
+            "Rallies": matches_df["Rallies"],
+            "Minutes": matches_df["MatchDuration"],
+        }
+    )
+    return facts_df.groupby(by=MATCH_DIMENSIONS).sum()
+
+
+def update_match_cube(
+    match_cube: pd.DataFrame, matches_diff: SnapshotDiff
+) -> pd.DataFrame:
+    added_df, removed_df = _added_and_removed(matches_diff)
+    return _apply_change(
+        match_cube, get_match_cube(added_df), get_match_cube(removed_df), "Matches"
+    )
+
+
+def get_tournament_cube(tournaments_df: pd.DataFrame) -> pd.DataFrame:
+    facts_df = pd.DataFrame(
+        {
+            "Year": tournaments_df["Year"],
+            "Month": tournaments_df["Month"],
+            "Week": tournaments_df["Week"],
+            "Weekday": tournaments_df["Weekday"],
+            "covid": tournaments_df["covid"],
+            "Tournaments": 1,
+            "Participants": tournaments_df["NumPlayers"],
+        }
+    )
+    return facts_df.groupby(by=TOURNAMENT_DIMENSIONS).sum()
+
+
+def update_tournament_cube(
+    tournament_cube: pd.DataFrame, tournaments_diff: SnapshotDiff
+) -> pd.DataFrame:
+    added_df, removed_df = _added_and_removed(tournaments_diff)
+    return _apply_change(
+        tournament_cube,
+        get_tournament_cube(added_df),
+        get_tournament_cube(removed_df),
+        "Tournaments",
+    )
+
+
+def _apply_change(
+    cube: pd.DataFrame, added: pd.DataFrame, removed: pd.DataFrame, count: str
+) -> pd.DataFrame:
+    # Every measure is a sum, so the cube of a snapshot is the previous cube
+    # plus the cube of the added rows minus the cube of the removed rows.
+    updated = cube.add(added, fill_value=0).sub(removed, fill_value=0)
+    updated = updated.loc[updated[count] > 0].astype(cube.dtypes.to_dict())
+    return updated.sort_index()
+
+
+def _covid_era(dates: pd.Series) -> np.ndarray:
+    return np.where(dates < pd.Timestamp(COVID_START_DATE), "pre", "post")
+
+
+# Module level, so that the previous snapshot survives Streamlit reruns.
+match_cube_aggregate = IncrementalAggregate(
+    get_match_cube, update_match_cube, keys=["matchid"]
+)
+tournament_cube_aggregate = IncrementalAggregate(
+    get_tournament_cube, update_tournament_cube, keys=["TournamentID"]
+)
@@ -0,0 +1,43 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class SnapshotDiff(NamedTuple):
+    inserted: pd.DataFrame
+    updated: pd.DataFrame
+    previous: pd.DataFrame
+    deleted: pd.DataFrame
+
+    @property
+    def changed_rows(self) -> int:
+        return len(self.inserted) + len(self.updated) + len(self.deleted)
+
+
+def diff_snapshots(
+    old_df: pd.DataFrame, new_df: pd.DataFrame, keys: list
+) -> SnapshotDiff:
+    # The key index of the old snapshot is a hash table, so matching every new
+    # row against it and comparing row hashes is linear in both sizes.
+    if list(old_df.columns) != list(new_df.columns):
+        raise ValueError("Snapshots with different columns cannot be diffed.")
+    old_index = pd.MultiIndex.from_frame(old_df[keys])
+    new_index = pd.MultiIndex.from_frame(new_df[keys])
+    if not (old_index.is_unique and new_index.is_unique):
+        raise ValueError(f"Snapshot keys {keys} are not unique.")
+
+    positions = old_index.get_indexer(new_index)
+    matched = positions >= 0
+    old_hashes = pd.util.hash_pandas_object(old_df, index=False).values
+    new_hashes = pd.util.hash_pandas_object(new_df, index=False).values
+    updated = matched & (old_hashes[positions] != new_hashes)
+    deleted = np.ones(len(old_df), dtype=bool)
+    deleted[positions[matched]] = False
+
+    return SnapshotDiff(
+        inserted=new_df.loc[~matched],
+        updated=new_df.loc[updated],
+        previous=old_df.iloc[positions[updated]],
+        deleted=old_df.loc[deleted],
+    )
@@ -0,0 +1,131 @@
+import datetime as dt
+import gzip
+import io
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from utils.catalog import DATASETS, snapshot_dates
+from utils.incremental import PREPROCESSED_VERSION
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_DIR = Path("data/exports")
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_FORMATS = {
+    "CSV (gzip)": {"extension": "csv.gz", "mime": "application/gzip"},
+    "Parquet": {"extension": "parquet", "mime": "application/octet-stream"},
+}
+# Export names are "<dataset>_<ngbId>", as given by the app.
+EXPORT_FILE_PATTERN = re.compile(
+    r"(?P<dataset>[a-z]+)_(?P<ngb_id>\d+)_(?P<date>\d{4}-\d{2}-\d{2})_v(?P<version>\d+)\."
+)
+
+
+def available_export_formats() -> list:
+    if pq is None:
+        return [name for name in EXPORT_FORMATS if name != "Parquet"]
+    return list(EXPORT_FORMATS)
+
+
+def export_file_name(name: str, snapshot_date: dt.date, export_format: str) -> str:
+    # The preprocessing version is part of the name, since it changes the
+    # exported columns without a new snapshot.
+    extension = EXPORT_FORMATS[export_format]["extension"]
+    return f"{name}_{str(snapshot_date)}_v{PREPROCESSED_VERSION}.{extension}"
+
+
+def export_path(name: str, snapshot_date: dt.date, export_format: str) -> Path:
+    return EXPORT_DIR / export_file_name(name, snapshot_date, export_format)
+
+
+def build_export(
+    df_to_export: pd.DataFrame, name: str, snapshot_date: dt.date, export_format: str
+) -> Path:
+    # Exports are immutable per snapshot, so an existing file is always reusable.
+    target_path = export_path(name, snapshot_date, export_format)
+    if target_path.exists():
+        return target_path
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    temporary_path = target_path.with_name(target_path.name + ".tmp")
+    if export_format == "Parquet":
+        _write_parquet(df_to_export, temporary_path)
+    else:
+        _write_csv_gzip(df_to_export, temporary_path)
+    os.replace(temporary_path, target_path)
+    return target_path
+
+
+def prune_exports(ngb_id: int) -> list:
+    # Removes the exports of the partition whose snapshot is no longer in the
+    # catalog or that were built by another preprocessing version. Files named
+    # in an older format are removed as well.
+    if not EXPORT_DIR.exists():
+        return []
+    dates = {
+        dataset: {str(date) for date in snapshot_dates(dataset, ngb_id=ngb_id)}
+        for dataset in DATASETS
+    }
+    removed = []
+    for file_path in EXPORT_DIR.iterdir():
+        if file_path.suffix == ".tmp":
+            continue
+        match = EXPORT_FILE_PATTERN.match(file_path.name)
+        if match is not None and int(match["ngb_id"]) != ngb_id:
+            continue
+        if (
+            match is None
+            or int(match["version"]) != PREPROCESSED_VERSION
+            or match["date"] not in dates.get(match["dataset"], set())
+        ):
+            file_path.unlink(missing_ok=True)
+            removed.append(file_path)
+    return removed
+
+
+def _write_csv_gzip(df_to_export: pd.DataFrame, file_path: Path) -> None:
+    with gzip.open(file_path, "wb") as gzip_file:
+        with io.TextIOWrapper(gzip_file, encoding="utf-8", newline="") as text_file:
+            for start in range(0, max(len(df_to_export), 1), EXPORT_CHUNK_ROWS):
+                df_to_export.iloc[start : start + EXPORT_CHUNK_ROWS].to_csv(
+                    text_file, header=(start == 0)
+                )
+
+
+def _write_parquet(df_to_export: pd.DataFrame, file_path: Path) -> None:
+    table = pa.Table.from_pandas(df_to_export, preserve_index=True)
+    pq.write_table(
+        table, file_path, row_group_size=EXPORT_CHUNK_ROWS, compression="snappy"
+    )
+
+
+def render_export_button(
+    container,
+    label: str,
+    name: str,
+    df_to_export: pd.DataFrame,
+    snapshot_date: dt.date,
+    export_format: str,
+) -> None:
+    target_path = export_path(name, snapshot_date, export_format)
+    if not target_path.exists():
+        if not container.button(f"Prepare {label.lower()}", key=f"export_{name}"):
+            return
+        with st.spinner(f"Preparing {label.lower()}..."):
+            target_path = build_export(df_to_export, name, snapshot_date, export_format)
+    with open(target_path, "rb") as export_file:
+        container.download_button(
+            label=label,
+            data=export_file,
+            file_name=target_path.name,
+            mime=EXPORT_FORMATS[export_format]["mime"],
+            key=f"download_{name}",
+        )
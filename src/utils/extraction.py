@@ -1,101 +1,247 @@
 import datetime as dt
-import glob
-import json
-from os import path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 
 import pandas as pd
 import pytz
 import requests
 import streamlit as st
 
+from utils.catalog import DATASETS, get_snapshot_entry, latest_snapshot_date
+from utils.columnar import SCHEMAS, ColumnarAccumulator
+from utils.fetching import (
+    API_URL,
+    fetch_tournament_listing,
+    iter_json_records,
+    iter_ranking_pages,
+)
+from utils.incremental import preprocess_incrementally
+from utils.match_store import update_match_store
+from utils.planner import (
+    plan_match_requests,
+    record_empty_response,
+    save_empty_responses,
+)
+from utils.snapshots import read_snapshot, write_snapshot
+from utils.summary import summarize, update_snapshot_summary
 
-def load_tournaments(skip: bool) -> pd.DataFrame:
-    wildcard = "data/tournaments*"
-    if skip and (len(glob.glob(wildcard)) > 0):
-        latest_pickle_date = get_latest_pickle_date(wildcard=wildcard)
-        tournaments_df_dirty = _load_pickle(
-            file_name=f"tournaments_{str(latest_pickle_date)}.pkl"
-        )
-        print(
-            f"Skipped loading new tournaments, loaded tournaments from {str(latest_pickle_date)}"
-        )
-    else:
-        current_date = dt.datetime.now().date()
-        if not path.exists(f"data/tournaments_{str(current_date)}.pkl"):
-            with st.spinner(
-                "Loading tournament data from Club Locker, please be patient..."
-            ):
-                _fetch_and_save_tournaments(
-                    file_name=f"tournaments_{str(current_date)}.pkl"
-                )
-        tournaments_df_dirty = _load_pickle(
-            file_name=f"tournaments_{str(current_date)}.pkl"
-        )
-    tournaments_df_dirty["StartDatePandas"] = pd.to_datetime(
-        tournaments_df_dirty["StartDate"]
+COVID_START_DATE = "2020-03-01"
+# Match draws are named freely by the organizers, in Finnish or English, so the
+# division is read from keywords of the draw title. The first match wins.
+DIVISION_KEYWORDS = {
+    "Junior": r"junior|boys|girls|pojat|tytöt|\b(?:[bgpt]u?|u)\d{2}\b",
+    "Women": r"women|ladies|naiset|nais",
+    "Men": r"\bmen\b|miehet|mies",
+}
+# Reports a status text and, for long fetches, the share done.
+Progress = Callable[[str, Optional[float]], None]
+
+
+def load_tournaments(
+    skip: bool,
+    ngb_id: int,
+    history_start: str,
+    as_of: dt.date = None,
+    progress: Progress = None,
+) -> pd.DataFrame:
+    progress = progress or streamlit_progress()
+    entry = _load_snapshot(
+        "tournaments",
+        ngb_id=ngb_id,
+        skip=skip,
+        as_of=as_of,
+        fetch=lambda: _fetch_and_save_tournaments(ngb_id, history_start, progress),
+        loading_text="Loading tournament data from Club Locker, please be patient...",
+        progress=progress,
+    )
+    tournaments_df = preprocess_incrementally(
+        "tournaments",
+        lambda: read_snapshot("tournaments", entry, ngb_id=ngb_id),
+        entry,
+        preprocess=_preprocess_tournaments,
+        sort_column="StartDatePandas",
+        ngb_id=ngb_id,
     )
-    tournaments_df_dirty = tournaments_df_dirty[
-        (tournaments_df_dirty["NumMatches"] > 0)
-        & (tournaments_df_dirty["NumPlayers"] > 0)
-    ]
-    tournaments_df = _preprocess_tournaments(tournaments_df_dirty)
     return tournaments_df
 
 
-def load_matches(skip: bool, tournaments_df: pd.DataFrame) -> pd.DataFrame:
+def load_matches(
+    skip: bool,
+    tournaments_df: pd.DataFrame,
+    ngb_id: int,
+    as_of: dt.date = None,
+    progress: Progress = None,
+) -> pd.DataFrame:
+    progress = progress or streamlit_progress()
     # Fetch and save tournament matches, if needed.
-    wildcard = "data/matches*"
-    if skip and (len(glob.glob(wildcard)) > 0):
-        latest_pickle_date = get_latest_pickle_date(wildcard=wildcard)
-        matches_df_dirty = _load_pickle(
-            file_name=f"matches_{str(latest_pickle_date)}.pkl"
-        )
-        print(
-            f"Skipped loading new matches, loaded matches from {str(latest_pickle_date)}"
+    entry = _load_snapshot(
+        "matches",
+        ngb_id=ngb_id,
+        skip=skip,
+        as_of=as_of,
+        fetch=lambda: _fetch_and_save_tournament_matches(
+            tournaments_df, ngb_id, progress
+        ),
+        loading_text="Loading match data from Club Locker. This can take a while, please be patient...",
+        progress=progress,
+    )
+    matches_df = preprocess_incrementally(
+        "matches",
+        lambda: read_snapshot("matches", entry, ngb_id=ngb_id),
+        entry,
+        preprocess=_preprocess_matches,
+        sort_column="MatchDatePandas",
+        ngb_id=ngb_id,
+    )
+    matches_df = pd.merge(
+        matches_df,
+        tournaments_df[["TournamentID", "TournamentName"]],
+        how="left",
+        on="TournamentID",
+    )
+    # The store mirrors the latest snapshot only, as the frame the app uses.
+    if as_of is None:
+        update_match_store(
+            matches_df,
+            entry,
+            get_snapshot_entry("tournaments", ngb_id=ngb_id),
+            ngb_id=ngb_id,
         )
-    else:
-        current_date = dt.datetime.now().date()
-        if not path.exists(f"data/matches_{str(current_date)}.pkl"):
-            with st.spinner(
-                "Loading match data from Club Locker. This can take a while, please be patient..."
-            ):
-                _fetch_and_save_tournament_matches(
-                    tournaments_df, file_name=f"matches_{str(current_date)}.pkl"
-                )
-        matches_df_dirty = _load_pickle(file_name=f"matches_{str(current_date)}.pkl")
-    matches_df = _preprocess_matches(matches_df_dirty, tournaments_df)
     return matches_df
 
 
-def load_rankings(skip: bool) -> pd.DataFrame:
+def load_rankings(
+    skip: bool,
+    ngb_id: int,
+    ranking_group: int,
+    ranking_divisions: List[int],
+    as_of: dt.date = None,
+    progress: Progress = None,
+) -> pd.DataFrame:
+    progress = progress or streamlit_progress()
     # Fetch and save ranking data, if needed.
-    wildcard = "data/rankings*"
-    if skip and (len(glob.glob(wildcard)) > 0):
-        latest_pickle_date = get_latest_pickle_date(wildcard=wildcard)
-        rankings_df_dirty = _load_pickle(
-            file_name=f"rankings_{str(latest_pickle_date)}.pkl"
-        )
-        print(
-            f"Skipped loading new rankings, loaded rankings from {str(latest_pickle_date)}"
-        )
-    else:
-        current_date = dt.datetime.now().date()
-        if not path.exists(f"data/rankings_{str(current_date)}.pkl"):
-            with st.spinner(
-                "Loading ranking data from Club Locker, please be patient..."
-            ):
-                _fetch_and_save_rankings(file_name=f"rankings_{str(current_date)}.pkl")
-        rankings_df_dirty = _load_pickle(file_name=f"rankings_{str(current_date)}.pkl")
-    rankings_df = _preprocess_rankings(rankings_df_dirty)
+    entry = _load_snapshot(
+        "rankings",
+        ngb_id=ngb_id,
+        skip=skip,
+        as_of=as_of,
+        fetch=lambda: _fetch_and_save_rankings(
+            ngb_id, ranking_group, ranking_divisions, progress
+        ),
+        loading_text="Loading ranking data from Club Locker, please be patient...",
+        progress=progress,
+    )
+    rankings_df = _preprocess_rankings(read_snapshot("rankings", entry, ngb_id=ngb_id))
     return rankings_df
 
 
+def no_progress(text: str, fraction: Optional[float] = None) -> None:
+    # Progress of crawls outside Streamlit, which log with print instead.
+    pass
+
+
+def crawl_federations(federations: dict, history_start: str) -> None:
+    # Federations are independent partitions, so they are crawled in parallel.
+    # The crawl runs outside Streamlit, so it reports no progress.
+    with ThreadPoolExecutor(max_workers=len(federations) or 1) as executor:
+        futures = [
+            executor.submit(
+                crawl_federation,
+                ngb_id,
+                federation["ranking_group"],
+                federation["ranking_divisions"],
+                history_start,
+                no_progress,
+            )
+            for ngb_id, federation in federations.items()
+        ]
+        for future in futures:
+            future.result()
+
+
+def crawl_federation(
+    ngb_id: int,
+    ranking_group: int,
+    ranking_divisions: List[int],
+    history_start: str,
+    progress: Progress = no_progress,
+) -> None:
+    tournaments_df = load_tournaments(
+        skip=False, ngb_id=ngb_id, history_start=history_start, progress=progress
+    )
+    matches_df = load_matches(
+        skip=False, tournaments_df=tournaments_df, ngb_id=ngb_id, progress=progress
+    )
+    rankings_df = load_rankings(
+        skip=False,
+        ngb_id=ngb_id,
+        ranking_group=ranking_group,
+        ranking_divisions=ranking_divisions,
+        progress=progress,
+    )
+    update_snapshot_summary(
+        {dataset: get_snapshot_entry(dataset, ngb_id=ngb_id) for dataset in DATASETS},
+        lambda: summarize(tournaments_df, matches_df, rankings_df),
+        ngb_id=ngb_id,
+    )
+
+
+def streamlit_progress() -> Progress:
+    # The elements are created on the first report, on the thread of the
+    # script run, which is the only thread Streamlit elements work on.
+    elements = {}
+
+    def report(text: str, fraction: Optional[float] = None) -> None:
+        if "status" not in elements:
+            elements["status"] = st.empty()
+        if fraction is not None:
+            if "bar" not in elements:
+                elements["bar"] = st.progress(0)
+            elements["bar"].progress(fraction)
+        elements["status"].text(text)
+
+    return report
+
+
+def _load_snapshot(
+    dataset: str,
+    ngb_id: int,
+    skip: bool,
+    as_of: Optional[dt.date],
+    fetch: Callable[[], None],
+    loading_text: str,
+    progress: Progress,
+) -> dict:
+    latest_date = latest_snapshot_date(dataset, ngb_id=ngb_id)
+    if as_of is not None or (skip and latest_date is not None):
+        entry = get_snapshot_entry(dataset, as_of=as_of, ngb_id=ngb_id)
+        if entry is None:
+            raise FileNotFoundError(
+                f"No {dataset} snapshot available for ngbId {ngb_id} as of {as_of}."
+            )
+        print(f"Skipped loading new {dataset}, loaded {dataset} from {entry['date']}")
+        return entry
+
+    current_date = dt.datetime.now().date()
+    if latest_date != current_date:
+        progress(loading_text, None)
+        fetch()
+    return get_snapshot_entry(dataset, ngb_id=ngb_id)
+
+
 def _preprocess_tournaments(tournaments_df_dirty: pd.DataFrame) -> pd.DataFrame:
     # Tournament data preprocessing.
+    tournaments_df_dirty["StartDatePandas"] = pd.to_datetime(
+        tournaments_df_dirty["StartDate"]
+    )
+    tournaments_df_dirty = tournaments_df_dirty[
+        (tournaments_df_dirty["NumMatches"] > 0)
+        & (tournaments_df_dirty["NumPlayers"] > 0)
+    ]
     start_dates = pd.to_datetime(tournaments_df_dirty["StartDate"].values.tolist())
     covid = []
     for start_date in start_dates:
-        if start_date < pd.to_datetime("2020-03-01"):
+        if start_date < pd.to_datetime(COVID_START_DATE):
             covid.append("pre")
         else:
             covid.append("post")
@@ -131,7 +277,7 @@ def _preprocess_rankings(rankings_df_dirty: pd.DataFrame) -> pd.DataFrame:
     return rankings_df
 
 
-def _preprocess_matches(matches_df_dirty, tournaments_df):
+def _preprocess_matches(matches_df_dirty: pd.DataFrame) -> pd.DataFrame:
     # Match data preprocessing.
     matches_df_dirty["hPlayerName"] = (
         matches_df_dirty["hPlayerName"]
@@ -171,19 +317,19 @@ def _preprocess_matches(matches_df_dirty, tournaments_df):
         .sum(axis=1)
     )
     matches_df_dirty["Game1DurationSecs"] = pd.to_datetime(
-        matches_df_dirty["gameDuration1"]
+        matches_df_dirty["gameDuration1"], utc=True
     ) - dt.datetime.fromtimestamp(0, pytz.utc)
     matches_df_dirty["Game2DurationSecs"] = pd.to_datetime(
-        matches_df_dirty["gameDuration2"]
+        matches_df_dirty["gameDuration2"], utc=True
     ) - dt.datetime.fromtimestamp(0, pytz.utc)
     matches_df_dirty["Game3DurationSecs"] = pd.to_datetime(
-        matches_df_dirty["gameDuration3"]
+        matches_df_dirty["gameDuration3"], utc=True
     ) - dt.datetime.fromtimestamp(0, pytz.utc)
     matches_df_dirty["Game4DurationSecs"] = pd.to_datetime(
-        matches_df_dirty["gameDuration4"]
+        matches_df_dirty["gameDuration4"], utc=True
     ) - dt.datetime.fromtimestamp(0, pytz.utc)
     matches_df_dirty["Game5DurationSecs"] = pd.to_datetime(
-        matches_df_dirty["gameDuration5"]
+        matches_df_dirty["gameDuration5"], utc=True
     ) - dt.datetime.fromtimestamp(0, pytz.utc)
     matches_df_dirty["MatchDuration"] = pd.to_datetime(
         matches_df_dirty["matchEnd"]
@@ -238,6 +384,7 @@ def _preprocess_matches(matches_df_dirty, tournaments_df):
         )
     )
     matches_df_dirty = matches_df_dirty.dropna(subset=["vPlayerName", "hPlayerName"])
+    matches_df_dirty["Division"] = _division_from_title(matches_df_dirty["Title"])
     matches_df_dirty["Weekday"] = [
         x.weekday() for x in matches_df_dirty["MatchDatePandas"]
     ]
@@ -245,114 +392,126 @@ def _preprocess_matches(matches_df_dirty, tournaments_df):
     matches_df_dirty["Month"] = [x.month for x in matches_df_dirty["MatchDatePandas"]]
     matches_df_dirty["Week"] = [x.week for x in matches_df_dirty["MatchDatePandas"]]
     matches_df_dirty.sort_values(by=["MatchDatePandas"], ascending=True, inplace=True)
-    matches_df_dirty = pd.merge(
-        matches_df_dirty,
-        tournaments_df[["TournamentID", "TournamentName"]],
-        how="left",
-        on="TournamentID",
-    )
     matches_df = matches_df_dirty
     return matches_df
 
 
-def _fetch_and_save_tournaments(file_name: str) -> None:
-    tournaments_list = []
+def _division_from_title(titles: pd.Series) -> pd.Series:
+    divisions = pd.Series("Open", index=titles.index)
+    undecided = pd.Series(True, index=titles.index)
+    for division, pattern in DIVISION_KEYWORDS.items():
+        matched = undecided & titles.str.contains(pattern, case=False, regex=True)
+        divisions[matched] = division
+        undecided &= ~matched
+    return divisions
+
+
+def _fetch_and_save_tournaments(
+    ngb_id: int, history_start: str, progress: Progress
+) -> None:
+    # Scheduled tournaments can be listed up to a year ahead.
+    first_date = dt.date.fromisoformat(history_start)
+    last_date = dt.datetime.now().date() + dt.timedelta(days=365)
+    tournaments = ColumnarAccumulator(SCHEMAS["tournaments"], key="TournamentID")
     tournament_types = {"scheduled": 1, "results": 3}
     for tournament_type in tournament_types.items():
-        try:
-            response = requests.get(
-                url=f"https://api.ussquash.com/resources/tournaments?TopRecords=500&ngbId=10142&OrganizerType=1&Sanctioned=1&Status={tournament_type[1]}",
-                timeout=10,
-            )
-            tournaments_js = json.loads(response.content)
-            for tournament_js in tournaments_js:
-                tournament_js["Type"] = tournament_type[0]
-                tournaments_list.append(tournament_js)
-        except requests.exceptions.Timeout:
-            print("TODO: Handle timeout better.")
-    tournaments_df = pd.DataFrame(tournaments_list, columns=tournaments_list[0].keys())
-    tournaments_df.to_pickle(f"data/{file_name}")
+        tournaments_js = fetch_tournament_listing(
+            ngb_id, tournament_type[1], first_date, last_date
+        )
+        print(
+            f"Listed {len(tournaments_js)} {tournament_type[0]} tournaments for ngbId {ngb_id}"
+        )
+        for tournament_js in tournaments_js:
+            tournament_js["Type"] = tournament_type[0]
+            tournaments.append(tournament_js)
+    progress(f"Listed {len(tournaments)} tournaments.", None)
+    _save_snapshot(tournaments.to_frame(), "tournaments", ngb_id)
 
 
 def _fetch_and_save_tournament_matches(
-    tournaments_df: pd.DataFrame, file_name: str
+    tournaments_df: pd.DataFrame, ngb_id: int, progress: Progress
 ) -> None:
     results_df = tournaments_df
-    dates_ids = list(
-        zip(
-            results_df["TournamentID"].values.tolist(),
-            results_df["StartDate"].values.tolist(),
-            results_df["EndDate"].values.tolist(),
-        )
+    request_plan = plan_match_requests(results_df)
+    print(
+        f"Planned {len(request_plan.requests)} match requests, avoided {request_plan.avoided} "
+        f"({request_plan.skipped_scheduled} scheduled, {request_plan.skipped_future} future, "
+        f"{request_plan.skipped_empty} known empty)"
     )
-    matches_list = []
+    requests_by_tournament = {}
+    for tournament_id, date in request_plan.requests:
+        requests_by_tournament.setdefault(tournament_id, []).append(date)
+    matches = ColumnarAccumulator(SCHEMAS["matches"], key="matchid")
     index = 0
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    for tournament in dates_ids:
-        date_range_list = [
-            str(x.date()) for x in pd.date_range(tournament[1], tournament[2])
-        ]
+    for tournament_id, date_range_list in requests_by_tournament.items():
         for date in date_range_list:
             try:
-                response = requests.get(
-                    url=f"https://api.ussquash.com/resources/res/trn/live_matrix?date={date}&tournamentId={tournament[0]}",
-                    timeout=10,
-                )
-                matches_js = json.loads(response.content)
-                for match_js in matches_js:
+                records = 0
+                for match_js in iter_json_records(
+                    url=f"{API_URL}/res/trn/live_matrix",
+                    params={"date": date, "tournamentId": tournament_id},
+                ):
+                    records += 1
                     if len(match_js) > 1:
-                        match_js["TournamentID"] = tournament[0]
-                        matches_list.append(match_js)
+                        match_js["TournamentID"] = tournament_id
+                        matches.append(match_js)
+                if records == 0:
+                    record_empty_response(tournament_id, date)
             except requests.exceptions.Timeout:
                 print("TODO: Handle timeout better.")
+            except (requests.exceptions.RequestException, ValueError) as error:
+                print(
+                    f"Failed to fetch matches of tournament {tournament_id} on {date}: {error}"
+                )
         print(
-            f"Fetched matches from tournament {tournament[0]}. Total matches loaded: {len(matches_list)}"
+            f"Fetched matches from tournament {tournament_id}. Total matches loaded: {len(matches)}"
         )
         index += 1
-        progress_bar.progress(index / len(dates_ids))
-        status_text.text(
-            f'Loaded matches from {results_df.loc[results_df["TournamentID"] == tournament[0]]["TournamentName"].values.tolist()[0]} tournament...'
+        progress(
+            f'Loaded matches from {results_df.loc[results_df["TournamentID"] == tournament_id]["TournamentName"].values.tolist()[0]} tournament...',
+            index / len(requests_by_tournament),
         )
-    status_text.text("")
-    matches_df_dirty = pd.DataFrame(matches_list, columns=matches_list[0].keys())
-    matches_df_dirty = matches_df_dirty.drop_duplicates(subset="matchid", keep="first")
-    matches_df_dirty.to_pickle(f"data/{file_name}")
+    progress(
+        f"Skipped {request_plan.avoided} requests that could not return matches.",
+        None,
+    )
+    save_empty_responses()
+    _save_snapshot(matches.to_frame(), "matches", ngb_id)
 
 
-def _fetch_and_save_rankings(file_name: str) -> None:
-    ranking_urls = [
-        "https://api.ussquash.com/resources/rankings/9/current?divisions=2",
-        "https://api.ussquash.com/resources/rankings/9/current?divisions=1",
-    ]
-    rankings_list = []
-    for ranking_url in ranking_urls:
-        for page_number in range(1, 20):
-            ranking_url_with_page_number = ranking_url + f"&pageNumber={page_number}"
-            try:
-                response = requests.get(url=ranking_url_with_page_number, timeout=10)
-                rankings_js = json.loads(response.content)
-                if len(rankings_js) == 0:
-                    break
-                for ranking_js in rankings_js:
-                    rankings_list.append(ranking_js)
-            except requests.exceptions.Timeout:
-                print("TODO: Handle timeout better.")
-    rankings_df = pd.DataFrame(rankings_list, columns=rankings_list[0].keys())
-    rankings_df.to_pickle(f"data/{file_name}")
+def _fetch_and_save_rankings(
+    ngb_id: int, ranking_group: int, ranking_divisions: List[int], progress: Progress
+) -> None:
+    rankings = ColumnarAccumulator(SCHEMAS["rankings"])
+    try:
+        for rankings_js in iter_ranking_pages(
+            ranking_group=ranking_group, divisions=ranking_divisions
+        ):
+            rankings.extend(rankings_js)
+    except requests.exceptions.Timeout as error:
+        # A partial ranking would replace the complete previous one.
+        print(f"{error}, kept the previous rankings snapshot for ngbId {ngb_id}")
+        return
+    print(f"Total rankings loaded: {len(rankings)}")
+    progress(f"Loaded {len(rankings)} rankings.", None)
+    _save_snapshot(rankings.to_frame(), "rankings", ngb_id)
 
 
-def _load_pickle(file_name: str) -> pd.DataFrame:
-    pickle = pd.read_pickle(f"data/{file_name}")
-    return pickle
+def _save_snapshot(df_to_save: pd.DataFrame, dataset: str, ngb_id: int) -> None:
+    # An empty crawl is more likely a failed one than an emptied dataset, so it
+    # only becomes a snapshot when there is nothing older to fall back to.
+    if len(df_to_save) == 0 and latest_snapshot_date(dataset, ngb_id=ngb_id):
+        print(f"Crawled no {dataset} for ngbId {ngb_id}, kept the previous snapshot")
+        return
+    write_snapshot(
+        df_to_save, dataset, snapshot_date=dt.datetime.now().date(), ngb_id=ngb_id
+    )
 
 
-def get_latest_pickle_date(wildcard: str) -> dt.date:
-    pickles = glob.glob(wildcard)
-    latest_date = dt.datetime.fromtimestamp(0).date()
-    for pickle in pickles:
-        date_string = pickle.split("_")[-1].split(".")[0]
-        pickle_date = dt.datetime.strptime(date_string, "%Y-%m-%d").date()
-        if pickle_date > latest_date:
-            latest_date = pickle_date
-    return latest_date
+def get_snapshot_key(skip: bool, ngb_id: int, as_of: dt.date = None) -> tuple:
+    if as_of is None and not skip:
+        return (ngb_id, str(dt.datetime.now().date()))
+    entries = [
+        get_snapshot_entry(dataset, as_of=as_of, ngb_id=ngb_id) for dataset in DATASETS
+    ]
+    return (ngb_id, *(entry["date"] if entry else None for entry in entries))
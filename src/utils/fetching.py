@@ -0,0 +1,310 @@
+import datetime as dt
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import requests
+import urllib3
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+API_URL = "https://api.ussquash.com/resources"
+REQUEST_TIMEOUT = 10
+MAX_WORKERS = 8
+TOURNAMENT_TOP_RECORDS = 500
+TOURNAMENT_WINDOW_DAYS = 365
+RANKING_ROWS_PER_PAGE = 1000
+# Pages requested ahead of the one being read, per division.
+RANKING_PREFETCH_PAGES = 2
+RANKING_RETRIES = 2
+# Upper bound on the pages of a division, in case the API keeps returning
+# pages regardless of the page number.
+RANKING_MAX_PAGES = 200
+
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=MAX_WORKERS))
+
+
+def get_json(url: str, params: dict = None) -> Optional[list]:
+    try:
+        return list(iter_json_records(url, params))
+    except requests.exceptions.Timeout:
+        print("TODO: Handle timeout better.")
+        return None
+    except (requests.exceptions.RequestException, ValueError) as error:
+        print(f"Failed to fetch {url}: {error}")
+        return None
+
+
+def iter_json_records(url: str, params: dict = None) -> Iterator[dict]:
+    # Yields the records of a JSON array response. With ijson they are decoded
+    # while the body streams in, so neither the whole body nor the whole
+    # decoded array is held in memory. Otherwise the body is decoded at once
+    # with orjson, or json as the last resort. An error status or a body that
+    # is not an array raises, so that it is not mistaken for an empty result.
+    with _session.get(
+        url=url, params=params, timeout=REQUEST_TIMEOUT, stream=True
+    ) as response:
+        response.raise_for_status()
+        if ijson is None:
+            records = _loads(response.content)
+            if not isinstance(records, list):
+                raise ValueError(f"Expected a JSON array from {url}")
+            yield from records
+            return
+        response.raw.decode_content = True
+        # The buffered reader would fail on a raw stream that closes itself
+        # once it is exhausted. The response closes it instead.
+        response.raw.auto_close = False
+        stream = io.BufferedReader(response.raw)
+        try:
+            if _first_character(stream) != b"[":
+                raise ValueError(f"Expected a JSON array from {url}")
+            yield from ijson.items(stream, "item", use_float=True)
+        except ijson.JSONError as error:
+            raise ValueError(f"Invalid JSON from {url}: {error}") from error
+        except urllib3.exceptions.ReadTimeoutError as error:
+            raise requests.exceptions.ReadTimeout(error) from error
+
+
+def fetch_concurrently(
+    fetch: Callable, items: Iterable, max_workers: int = MAX_WORKERS
+) -> list:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch, items))
+
+
+def fetch_tournament_listing(
+    ngb_id: int,
+    status: int,
+    first_date: dt.date,
+    last_date: dt.date,
+    window_days: int = TOURNAMENT_WINDOW_DAYS,
+) -> List[dict]:
+    # A window that hits the TopRecords cap may be truncated, so it is split in
+    # half and fetched again until every window is below the cap. Splitting
+    # only helps when the endpoint honours the date filter, so it stops when a
+    # window returns tournaments outside its range or the same tournaments as
+    # the window it was split from.
+    windows = [
+        (window, None)
+        for window in _split_date_range(first_date, last_date, window_days)
+    ]
+    tournaments_list = []
+    ignored_windows = 0
+    while windows:
+        results = fetch_concurrently(
+            lambda window: _fetch_tournament_window(ngb_id, status, *window[0]),
+            windows,
+        )
+        truncated_windows = []
+        for (window, parent_ids), tournaments_js in zip(windows, results):
+            if tournaments_js is None:
+                continue
+            tournaments_list.extend(tournaments_js)
+            if len(tournaments_js) < TOURNAMENT_TOP_RECORDS:
+                continue
+            tournament_ids = frozenset(
+                tournament_js["TournamentID"] for tournament_js in tournaments_js
+            )
+            if not _within_window(tournaments_js, window):
+                ignored_windows += 1
+            elif tournament_ids == parent_ids:
+                print(
+                    f"Warning: splitting the date window {window[0]} - {window[1]} returned the same "
+                    f"{len(tournaments_js)} tournaments, so it stays truncated."
+                )
+            elif window[0] == window[1]:
+                print(
+                    f"Warning: {window[0]} alone has {TOURNAMENT_TOP_RECORDS} or more tournaments, "
+                    "so the listing of that day is truncated."
+                )
+            else:
+                truncated_windows.extend(
+                    (half, tournament_ids) for half in _split_window(window)
+                )
+        windows = truncated_windows
+    if ignored_windows:
+        print(
+            f"Warning: the tournament listing ignored the date filter in {ignored_windows} windows, "
+            f"so status {status} stays truncated at {TOURNAMENT_TOP_RECORDS} tournaments."
+        )
+    return deduplicate(tournaments_list, key="TournamentID")
+
+
+def iter_ranking_pages(
+    ranking_group: int,
+    divisions: List[int],
+    prefetch: int = RANKING_PREFETCH_PAGES,
+) -> Iterator[list]:
+    # Every division keeps a few page requests in flight, and a new one is
+    # issued whenever a page is read. The first empty page ends the division,
+    # and the requests prefetched past it are dropped. The page size is not
+    # trusted, since the server may cap rowsPerPage below the requested size.
+    # A page that repeats the players of the previous one, or RANKING_MAX_PAGES
+    # pages, also end the division.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending = {}
+        next_page = {division: 1 for division in divisions}
+
+        def submit(division: int) -> None:
+            page_number = next_page[division]
+            next_page[division] += 1
+            pending[(division, page_number)] = executor.submit(
+                _fetch_ranking_page, ranking_group, division, page_number
+            )
+
+        for division in divisions:
+            for _ in range(prefetch):
+                submit(division)
+
+        for division in divisions:
+            page_number = 1
+            previous_player_ids = None
+            while True:
+                if page_number > RANKING_MAX_PAGES:
+                    print(
+                        f"Warning: stopped division {division} at {RANKING_MAX_PAGES} ranking pages."
+                    )
+                    break
+                rankings_js = pending.pop((division, page_number)).result()
+                retries = 0
+                while rankings_js is None:
+                    # A timed out page is fetched again rather than taken for
+                    # the end of the division.
+                    if retries == RANKING_RETRIES:
+                        raise requests.exceptions.Timeout(
+                            f"Ranking page {page_number} of division {division} timed out"
+                        )
+                    retries += 1
+                    rankings_js = _fetch_ranking_page(
+                        ranking_group, division, page_number
+                    )
+                if not rankings_js:
+                    break
+                player_ids = [ranking_js.get("playerId") for ranking_js in rankings_js]
+                if player_ids == previous_player_ids:
+                    print(
+                        f"Warning: ranking page {page_number} of division {division} repeats the previous "
+                        "page, so the page number is ignored."
+                    )
+                    break
+                previous_player_ids = player_ids
+                yield rankings_js
+                submit(division)
+                page_number += 1
+            print(f"Fetched {page_number - 1} ranking pages for division {division}.")
+        for future in pending.values():
+            future.cancel()
+
+
+def deduplicate(records: List[dict], key: str) -> List[dict]:
+    seen_keys = set()
+    unique_records = []
+    for record in records:
+        if record[key] in seen_keys:
+            continue
+        seen_keys.add(record[key])
+        unique_records.append(record)
+    return unique_records
+
+
+def _first_character(stream: io.BufferedReader) -> bytes:
+    # Peeks past leading whitespace without consuming the first character.
+    while True:
+        buffered = stream.peek()
+        if not buffered:
+            return b""
+        stripped = buffered.lstrip()
+        if stripped:
+            stream.read(len(buffered) - len(stripped))
+            return stripped[:1]
+        stream.read(len(buffered))
+
+
+def _loads(content: bytes) -> list:
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _fetch_tournament_window(
+    ngb_id: int, status: int, window_start: dt.date, window_end: dt.date
+) -> Optional[list]:
+    # The date filter parameters are not documented, so fetch_tournament_listing
+    # checks the returned dates instead of trusting the filter.
+    return get_json(
+        url=f"{API_URL}/tournaments",
+        params={
+            "TopRecords": TOURNAMENT_TOP_RECORDS,
+            "ngbId": ngb_id,
+            "OrganizerType": 1,
+            "Sanctioned": 1,
+            "Status": status,
+            "StartDate": str(window_start),
+            "EndDate": str(window_end),
+        },
+    )
+
+
+def _within_window(tournaments_js: List[dict], window: tuple) -> bool:
+    # A tournament belongs to a window when its dates overlap the window.
+    window_start, window_end = window
+    for tournament_js in tournaments_js:
+        start_date = _listing_date(tournament_js.get("StartDate"))
+        end_date = _listing_date(tournament_js.get("EndDate")) or start_date
+        if start_date is None:
+            continue
+        if end_date < window_start or start_date > window_end:
+            return False
+    return True
+
+
+def _listing_date(value: Optional[str]) -> Optional[dt.date]:
+    # The listing returns dates as MM-DD-YYYY.
+    if not value:
+        return None
+    try:
+        return dt.datetime.strptime(value[:10], "%m-%d-%Y").date()
+    except ValueError:
+        return None
+
+
+def _fetch_ranking_page(
+    ranking_group: int, division: int, page_number: int
+) -> Optional[list]:
+    return get_json(
+        url=f"{API_URL}/rankings/{ranking_group}/current",
+        params={
+            "divisions": division,
+            "pageNumber": page_number,
+            "rowsPerPage": RANKING_ROWS_PER_PAGE,
+        },
+    )
+
+
+def _split_date_range(
+    first_date: dt.date, last_date: dt.date, window_days: int
+) -> List[tuple]:
+    windows = []
+    window_start = first_date
+    while window_start <= last_date:
+        window_end = min(window_start + dt.timedelta(days=window_days - 1), last_date)
+        windows.append((window_start, window_end))
+        window_start = window_end + dt.timedelta(days=1)
+    return windows
+
+
+def _split_window(window: tuple) -> List[tuple]:
+    window_start, window_end = window
+    middle = window_start + (window_end - window_start) // 2
+    return [(window_start, middle), (middle + dt.timedelta(days=1), window_end)]
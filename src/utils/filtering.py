@@ -0,0 +1,116 @@
+import datetime as dt
+import threading
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from utils.aggregation import get_active_players, get_common_matchups
+from utils.courts import court_utilization
+from utils.cube import build_cube
+from utils.extraction import COVID_START_DATE
+from utils.network import PlayerNetwork
+from utils.summary import summarize
+
+COVID_ERAS = {"All": None, "Pre-covid": "pre", "Post-covid": "post"}
+# Filters whose models are kept per snapshot and partition.
+FILTERED_MODEL_ENTRIES = 8
+
+
+class StudyFilter(NamedTuple):
+    start: dt.date
+    end: dt.date
+    covid: Optional[str] = None
+    divisions: Tuple[str, ...] = ()
+
+
+def date_bounds(study_filter: StudyFilter) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    # The covid eras are date ranges as well, so they narrow the same bounds.
+    # The upper bound is exclusive.
+    start = pd.Timestamp(study_filter.start)
+    end = pd.Timestamp(study_filter.end) + pd.Timedelta(days=1)
+    if study_filter.covid == "pre":
+        end = min(end, pd.Timestamp(COVID_START_DATE))
+    elif study_filter.covid == "post":
+        start = max(start, pd.Timestamp(COVID_START_DATE))
+    return start, end
+
+
+def slice_by_date(
+    df: pd.DataFrame, column: str, start: pd.Timestamp, end: pd.Timestamp
+) -> pd.DataFrame:
+    # The frames are sorted by their date column, so a date range is a
+    # contiguous block of rows found with two binary searches.
+    dates = df[column].values
+    first = dates.searchsorted(start.to_datetime64(), side="left")
+    last = dates.searchsorted(end.to_datetime64(), side="left")
+    return df.iloc[first:last]
+
+
+def apply_study_filter(
+    tournaments_df: pd.DataFrame, matches_df: pd.DataFrame, study_filter: StudyFilter
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    start, end = date_bounds(study_filter)
+    tournaments_df = slice_by_date(tournaments_df, "StartDatePandas", start, end)
+    matches_df = slice_by_date(matches_df, "MatchDatePandas", start, end)
+    if study_filter.divisions:
+        matches_df = matches_df.loc[
+            matches_df["Division"].isin(study_filter.divisions).values
+        ]
+        tournaments_df = tournaments_df.loc[
+            tournaments_df["TournamentID"].isin(matches_df["TournamentID"]).values
+        ]
+    return tournaments_df, matches_df
+
+
+@st.experimental_memo(max_entries=32)
+def filtered_aggregates(
+    snapshot: Hashable,
+    partition: Hashable,
+    study_filter: StudyFilter,
+    _tournaments_df: pd.DataFrame,
+    _matches_df: pd.DataFrame,
+    _rankings_df: pd.DataFrame,
+) -> dict:
+    # The frames are left out of the cache key, since they are determined by
+    # the snapshot, the partition and the filter. Rankings are not filtered.
+    return {
+        "active_players": get_active_players(_matches_df),
+        "common_matchups": get_common_matchups(_matches_df),
+        "summary": summarize(_tournaments_df, _matches_df, _rankings_df),
+    }
+
+
+def filtered_models(
+    snapshot: Hashable,
+    partition: Hashable,
+    study_filter: StudyFilter,
+    tournaments_df: pd.DataFrame,
+    matches_df: pd.DataFrame,
+) -> dict:
+    # The models are shared by all sessions as they are, instead of being
+    # pickled on every rerun, so they must not be modified. Only the most
+    # recently used filters are kept.
+    lock, models = _filtered_model_cache(snapshot, partition)
+    with lock:
+        if study_filter in models:
+            models.move_to_end(study_filter)
+            return models[study_filter]
+    filtered = {
+        "cube": build_cube(tournaments_df, matches_df),
+        "court_utilization": court_utilization(matches_df),
+        "player_network": PlayerNetwork(matches_df),
+    }
+    with lock:
+        models[study_filter] = filtered
+        while len(models) > FILTERED_MODEL_ENTRIES:
+            models.popitem(last=False)
+    return filtered
+
+
+@st.experimental_singleton
+def _filtered_model_cache(
+    snapshot: Hashable, partition: Hashable
+) -> Tuple[threading.Lock, OrderedDict]:
+    return threading.Lock(), OrderedDict()
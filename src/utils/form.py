@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+FORM_WINDOW = 10
+
+
+def rolling_form(
+    player_ids: np.ndarray,
+    outcomes: np.ndarray,
+    rally_differentials: np.ndarray,
+    window: int = FORM_WINDOW,
+) -> pd.DataFrame:
+    # The rows are the matches of every player, grouped by player and in date
+    # order within a player. Outcomes are 1 for a win, -1 for a loss and 0 for
+    # an undecided match. A rolling sum over the last matches of a player is a
+    # difference of two cumulative sums, where the window is cut at the first
+    # match of the player.
+    positions = np.arange(len(player_ids))
+    group_starts = _group_starts(player_ids)
+    lengths = np.minimum(positions - group_starts + 1, window)
+    return pd.DataFrame(
+        {
+            "RollingWinRate": _rolling_sum(outcomes == 1, lengths) / lengths,
+            "RollingRallyDifferential": _rolling_sum(rally_differentials, lengths)
+            / lengths,
+            "Streak": _streaks(player_ids, outcomes),
+        }
+    )
+
+
+def streak_records(
+    player_ids: np.ndarray, outcomes: np.ndarray, players: int
+) -> pd.DataFrame:
+    # Run-length encoding of the outcomes, with a new run starting at every
+    # change of player or outcome. The current streak is the last run of a
+    # player, positive for wins and negative for losses.
+    run_starts = _run_starts(player_ids, outcomes)
+    run_lengths = np.diff(np.append(run_starts, len(player_ids)))
+    run_players = player_ids[run_starts]
+    run_outcomes = outcomes[run_starts]
+
+    longest_wins = np.zeros(players, dtype=np.int64)
+    longest_losses = np.zeros(players, dtype=np.int64)
+    np.maximum.at(
+        longest_wins, run_players[run_outcomes == 1], run_lengths[run_outcomes == 1]
+    )
+    np.maximum.at(
+        longest_losses,
+        run_players[run_outcomes == -1],
+        run_lengths[run_outcomes == -1],
+    )
+    current = np.zeros(players, dtype=np.int64)
+    last_runs = np.diff(run_players, append=-1) != 0
+    current[run_players[last_runs]] = (run_lengths * run_outcomes)[last_runs]
+    return pd.DataFrame(
+        {
+            "CurrentStreak": current,
+            "LongestWinStreak": longest_wins,
+            "LongestLosingStreak": longest_losses,
+        }
+    )
+
+
+def _group_starts(player_ids: np.ndarray) -> np.ndarray:
+    starts = np.flatnonzero(np.diff(player_ids, prepend=-1) != 0)
+    return np.repeat(starts, np.diff(np.append(starts, len(player_ids))))
+
+
+def _run_starts(player_ids: np.ndarray, outcomes: np.ndarray) -> np.ndarray:
+    changed = np.ones(len(player_ids), dtype=bool)
+    changed[1:] = (player_ids[1:] != player_ids[:-1]) | (outcomes[1:] != outcomes[:-1])
+    return np.flatnonzero(changed)
+
+
+def _rolling_sum(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    cumulative = np.concatenate([[0], np.cumsum(values, dtype=np.float64)])
+    ends = np.arange(1, len(values) + 1)
+    return cumulative[ends] - cumulative[ends - lengths]
+
+
+def _streaks(player_ids: np.ndarray, outcomes: np.ndarray) -> np.ndarray:
+    # The streak after each match is its position within its run.
+    run_starts = _run_starts(player_ids, outcomes)
+    run_lengths = np.diff(np.append(run_starts, len(player_ids)))
+    positions = np.arange(len(player_ids)) - np.repeat(run_starts, run_lengths) + 1
+    return positions * outcomes
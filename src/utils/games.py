@@ -0,0 +1,102 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+GAMES = 5
+# A game goes to a tie-break when both players reach 10 points.
+TIE_BREAK_POINTS = 10
+WINNER_COLUMNS = [f"wset{game}" for game in range(1, GAMES + 1)]
+LOSER_COLUMNS = [f"oset{game}" for game in range(1, GAMES + 1)]
+
+
+class GameAnalytics(NamedTuple):
+    # Arrays of matches × games, except for comebacks which is per match. Won
+    # and margins are seen from the match winner.
+    played: np.ndarray
+    won: np.ndarray
+    margins: np.ndarray
+    tie_breaks: np.ndarray
+    comebacks: np.ndarray
+
+
+def score_tensor(matches_df: pd.DataFrame) -> np.ndarray:
+    # The points of the match winner and the match loser in each game, aligned
+    # with the rows of the match table. Games that were not played are zeros.
+    scores = np.zeros((len(matches_df), GAMES, 2), dtype=np.int16)
+    scores[:, :, 0] = np.nan_to_num(matches_df[WINNER_COLUMNS].values)
+    scores[:, :, 1] = np.nan_to_num(matches_df[LOSER_COLUMNS].values)
+    return scores
+
+
+def game_analytics(scores: np.ndarray) -> GameAnalytics:
+    winner_points = scores[:, :, 0]
+    loser_points = scores[:, :, 1]
+    played = (winner_points + loser_points) > 0
+    won = winner_points > loser_points
+    return GameAnalytics(
+        played=played,
+        won=won,
+        margins=winner_points - loser_points,
+        tie_breaks=np.minimum(winner_points, loser_points) >= TIE_BREAK_POINTS,
+        comebacks=played[:, 1] & ~won[:, 0] & ~won[:, 1],
+    )
+
+
+def player_game_stats(
+    analytics: GameAnalytics,
+    winner_ids: np.ndarray,
+    loser_ids: np.ndarray,
+    players: int,
+) -> pd.DataFrame:
+    # Every per-game array is added to the rows of the match winner as is and
+    # to the rows of the match loser flipped, in one np.add.at per array. The
+    # IDs are -1 for undecided matches, which are left out.
+    decided = (winner_ids >= 0) & (loser_ids >= 0)
+    ids = np.concatenate([winner_ids[decided], loser_ids[decided]])
+    played = np.tile(analytics.played[decided], (2, 1))
+    won = np.concatenate(
+        [analytics.won[decided], analytics.played[decided] & ~analytics.won[decided]]
+    )
+    margins = np.concatenate([analytics.margins[decided], -analytics.margins[decided]])
+    tie_breaks = np.tile(analytics.tie_breaks[decided], (2, 1))
+    # The match loser was 0-2 down when the match winner won the first two.
+    down_two = np.concatenate(
+        [
+            analytics.comebacks[decided],
+            analytics.won[decided][:, 0] & analytics.won[decided][:, 1],
+        ]
+    )
+    comebacks = np.concatenate(
+        [analytics.comebacks[decided], np.zeros(decided.sum(), dtype=bool)]
+    )
+
+    games_played = np.zeros((players, GAMES), dtype=np.int64)
+    games_won = np.zeros((players, GAMES), dtype=np.int64)
+    np.add.at(games_played, ids, played)
+    np.add.at(games_won, ids, won)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        game_win_rates = np.round(100 * games_won / games_played)
+        average_margins = np.round(
+            np.bincount(ids, weights=margins.sum(axis=1), minlength=players)
+            / games_played.sum(axis=1),
+            1,
+        )
+
+    stats_df = pd.DataFrame(
+        game_win_rates, columns=[f"Game {game}" for game in range(1, GAMES + 1)]
+    )
+    stats_df["Average Margin"] = average_margins
+    stats_df["Tie-Breaks"] = np.bincount(
+        ids, weights=tie_breaks.sum(axis=1), minlength=players
+    ).astype(np.int64)
+    stats_df["Tie-Break Wins"] = np.bincount(
+        ids, weights=(tie_breaks & won).sum(axis=1), minlength=players
+    ).astype(np.int64)
+    stats_df["Down 0-2"] = np.bincount(ids, weights=down_two, minlength=players).astype(
+        np.int64
+    )
+    stats_df["Comebacks"] = np.bincount(
+        ids, weights=comebacks, minlength=players
+    ).astype(np.int64)
+    return stats_df
@@ -1,12 +1,17 @@
 import base64
+import functools
+from pathlib import Path
+from types import ModuleType
+from typing import Optional
 
-import pandas as pd
 import streamlit as st
 
-
-@st.experimental_memo
-def convert_df_to_csv(df_to_convert: pd.DataFrame) -> str:
-    return df_to_convert.to_csv().encode("utf-8")
+from utils.assets import (
+    ASSET_FORMATS,
+    is_asset_built,
+    static_asset_path,
+    static_asset_url,
+)
 
 
 def hide_table_row_index() -> str:
@@ -20,10 +25,57 @@ def hide_table_row_index() -> str:
 
 
 def custom_css(background_path: str) -> None:
+    # The modification time is part of the cache key, so that the CSS picks up
+    # assets built after it was first cached.
+    st.markdown(
+        _custom_css_string(background_path, _asset_mtime(background_path)),
+        unsafe_allow_html=True,
+    )
+
+
+def header_image(container: ModuleType, image_path: str, caption: str) -> None:
+    # Built headers are loaded by the browser from their static URL, instead of
+    # being sent through the media endpoint on every run.
+    asset_name = Path(image_path).stem
+    if not is_asset_built(asset_name):
+        container.image(image_path, caption=caption)
+        return
+    container.markdown(
+        "<picture>"
+        f"<source srcset='{static_asset_url(asset_name, 'webp')}' type='image/webp'>"
+        f"<img src='{static_asset_url(asset_name, 'jpg')}' alt='{caption}' style='width: 100%;'>"
+        "</picture>"
+        f"<p style='text-align: center; color: #d4d4d4; font-size: 0.8em;'>{caption}</p>",
+        unsafe_allow_html=True,
+    )
+
+
+def _asset_mtime(image_path: str) -> Optional[float]:
+    asset_name = Path(image_path).stem
+    if not is_asset_built(asset_name):
+        return None
+    return max(
+        static_asset_path(asset_name, extension).stat().st_mtime
+        for extension in ASSET_FORMATS
+    )
+
+
+def _background_image_css(background_path: str) -> str:
+    asset_name = Path(background_path).stem
+    if is_asset_built(asset_name):
+        return f"""background-image: url({static_asset_url(asset_name, "jpg")});
+            background-image: image-set(
+                url({static_asset_url(asset_name, "webp")}) type("image/webp"),
+                url({static_asset_url(asset_name, "jpg")}) type("image/jpeg")
+            );"""
     with open(background_path, "rb") as image:
         encoded_string = base64.b64encode(image.read())
-    st.markdown(
-        f"""
+    return f"background-image: url(data:image/png;base64,{encoded_string.decode()});"
+
+
+@functools.lru_cache(maxsize=16)
+def _custom_css_string(background_path: str, asset_mtime: Optional[float]) -> str:
+    return f"""
         <style>
         @import url('https://fonts.googleapis.com/css2?family=PT+Sans');
 		html, body, [class*="css"]  {{
@@ -117,7 +169,7 @@ def custom_css(background_path: str) -> None:
         }}
 
         [data-testid="stAppViewContainer"] > .main {{
-            background-image: url(data:image/{"png"};base64,{encoded_string.decode()});
+            {_background_image_css(background_path)}
             background-size: cover;
             background-attachment: local;
             background-position: 66%;
@@ -126,9 +178,7 @@ def custom_css(background_path: str) -> None:
             animation-fill-mode: forwards;
         }}
         </style>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
 
 
 def caption_text(name: str, text: str) -> str:
@@ -0,0 +1,117 @@
+import os
+from typing import Callable, Optional
+
+import pandas as pd
+
+from utils.catalog import ROOT_PARTITION_NGB_ID, load_catalog, partition_dir
+from utils.snapshots import SNAPSHOT_KEYS
+
+PREPROCESSED_DIR_NAME = "preprocessed"
+# Bump whenever a preprocessing function changes its output.
+PREPROCESSED_VERSION = 2
+
+
+def preprocess_incrementally(
+    dataset: str,
+    read_raw: Callable[[], pd.DataFrame],
+    raw_entry: dict,
+    preprocess: Callable[[pd.DataFrame], pd.DataFrame],
+    sort_column: str,
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> pd.DataFrame:
+    (key,) = SNAPSHOT_KEYS[dataset]
+    state = _load_state(dataset, ngb_id)
+    latest = load_catalog(ngb_id)["latest"][dataset] == raw_entry["date"]
+
+    if state is not None and state["raw_checksum"] == raw_entry["checksum"]:
+        return state["frame"].copy()
+
+    raw_df = read_raw()
+    changed_keys = None
+    if state is not None and latest and state["raw_date"] < raw_entry["date"]:
+        changed_keys = _changed_keys_since(
+            dataset, raw_entry, state["raw_date"], ngb_id
+        )
+
+    if changed_keys is None:
+        processed_df = _preprocess(raw_df, preprocess)
+    else:
+        cached_df = state["frame"]
+        cached_df = cached_df.loc[~cached_df[key].isin(changed_keys)]
+        new_rows = (raw_df[key] > state["watermark"]) | raw_df[key].isin(changed_keys)
+        new_df = _preprocess(raw_df.loc[new_rows].copy(), preprocess)
+        processed_df = pd.concat([cached_df, new_df], ignore_index=True)
+        if len(new_df) > 0 and len(cached_df) > 0:
+            if new_df[sort_column].min() < cached_df[sort_column].max():
+                processed_df.sort_values(
+                    by=[sort_column], kind="stable", inplace=True, ignore_index=True
+                )
+        print(
+            f"Preprocessed {len(new_df)} new or changed {dataset} rows past watermark {state['watermark']}"
+        )
+
+    if latest:
+        _save_state(
+            dataset,
+            ngb_id,
+            {
+                "version": PREPROCESSED_VERSION,
+                "raw_date": raw_entry["date"],
+                "raw_checksum": raw_entry["checksum"],
+                "watermark": raw_df[key].max() if len(raw_df) > 0 else None,
+                "frame": processed_df,
+            },
+        )
+    return processed_df.copy()
+
+
+def _preprocess(
+    raw_df: pd.DataFrame, preprocess: Callable[[pd.DataFrame], pd.DataFrame]
+) -> pd.DataFrame:
+    if len(raw_df) == 0:
+        return pd.DataFrame()
+    return preprocess(raw_df)
+
+
+def _changed_keys_since(
+    dataset: str, raw_entry: dict, since_date: str, ngb_id: int
+) -> Optional[pd.Index]:
+    # Keys touched by the deltas between two snapshots. Returns None when the
+    # chain passes a base, since a base does not record what changed.
+    snapshots = load_catalog(ngb_id)["snapshots"][dataset]
+    changed_keys = []
+    entry = raw_entry
+    while entry["date"] > since_date:
+        if entry["kind"] != "delta":
+            return None
+        delta = pd.read_pickle(partition_dir(ngb_id) / entry["file"])
+        changed_keys.append(delta["upserts"][delta["keys"][0]])
+        changed_keys.append(delta["deleted"][delta["keys"][0]])
+        entry = snapshots.get(entry["parent"])
+        if entry is None:
+            return None
+    if entry["date"] != since_date:
+        return None
+    return pd.Index(pd.concat(changed_keys).unique()) if changed_keys else pd.Index([])
+
+
+def _state_path(dataset: str, ngb_id: int):
+    return partition_dir(ngb_id) / PREPROCESSED_DIR_NAME / f"{dataset}.pkl"
+
+
+def _load_state(dataset: str, ngb_id: int) -> Optional[dict]:
+    state_path = _state_path(dataset, ngb_id)
+    if not state_path.exists():
+        return None
+    state = pd.read_pickle(state_path)
+    if state.get("version") != PREPROCESSED_VERSION or state["watermark"] is None:
+        return None
+    return state
+
+
+def _save_state(dataset: str, ngb_id: int, state: dict) -> None:
+    state_path = _state_path(dataset, ngb_id)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = state_path.with_name(state_path.name + ".tmp")
+    pd.to_pickle(state, temporary_path)
+    os.replace(temporary_path, state_path)
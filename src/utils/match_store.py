@@ -0,0 +1,195 @@
+import datetime as dt
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from utils.catalog import ROOT_PARTITION_NGB_ID, partition_dir
+from utils.incremental import PREPROCESSED_VERSION
+
+MATCH_STORE_DIR_NAME = "match_store"
+MANIFEST_FILE_NAME = "manifest.json"
+# Bump whenever the layout of the store or of its manifest changes.
+MATCH_STORE_VERSION = 3
+
+# Manifests by partition, with the modification time of the file they were
+# read from.
+_manifests: Dict[int, Tuple[int, dict]] = {}
+_manifest_lock = threading.Lock()
+
+
+def update_match_store(
+    matches_df: pd.DataFrame,
+    raw_entry: dict,
+    tournaments_entry: dict,
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> dict:
+    # Preprocessed matches are stored in one file per year and tournament. Only
+    # the partitions whose content changed are rewritten. The rows depend on
+    # the matches and tournaments snapshots and on the preprocessing.
+    manifest = load_manifest(ngb_id)
+    sources = {
+        "matches": raw_entry["checksum"],
+        "tournaments": tournaments_entry["checksum"],
+        "preprocessed_version": PREPROCESSED_VERSION,
+    }
+    if manifest["sources"] == sources:
+        return manifest
+
+    store_dir = _store_dir(ngb_id)
+    # Rows are hashed once for the whole frame, and a partition is hashed from
+    # the hashes of its rows.
+    row_hashes = pd.util.hash_pandas_object(matches_df, index=False).values
+    partitions = {}
+    for (year, tournament_id), rows in matches_df.groupby(
+        ["Year", "TournamentID"], sort=False
+    ).indices.items():
+        partition_df = matches_df.iloc[rows]
+        name = f"{year}/{tournament_id}"
+        content_hash = hashlib.sha256(row_hashes[rows].tobytes()).hexdigest()
+        previous = manifest["partitions"].get(name)
+        if previous is None or previous["hash"] != content_hash:
+            file_path = store_dir / f"{name}.pkl"
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_path = file_path.with_name(file_path.name + ".tmp")
+            partition_df.reset_index(drop=True).to_pickle(temporary_path)
+            os.replace(temporary_path, file_path)
+        partitions[name] = {
+            "year": int(year),
+            "tournament_id": int(tournament_id),
+            "rows": len(partition_df),
+            "hash": content_hash,
+            "min_date": str(partition_df["MatchDatePandas"].min()),
+            "max_date": str(partition_df["MatchDatePandas"].max()),
+            "players": sorted(
+                set(partition_df["hPlayerName"]) | set(partition_df["vPlayerName"])
+            ),
+        }
+    for name in manifest["partitions"].keys() - partitions.keys():
+        os.remove(store_dir / f"{name}.pkl")
+
+    manifest = {
+        "version": MATCH_STORE_VERSION,
+        "raw_date": raw_entry["date"],
+        "sources": sources,
+        "columns": list(matches_df.columns),
+        "partitions": partitions,
+    }
+    _save_manifest(manifest, ngb_id)
+    return manifest
+
+
+def query_matches(
+    start: Optional[dt.date] = None,
+    end: Optional[dt.date] = None,
+    tournament_ids: Optional[Iterable[int]] = None,
+    players: Optional[Iterable[str]] = None,
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> pd.DataFrame:
+    # The filters are first applied to the manifest, so only the partitions
+    # that can contain matching rows are read, and then to the rows themselves.
+    manifest = load_manifest(ngb_id)
+    names = prune_partitions(manifest, start, end, tournament_ids, players)
+    if not names:
+        return pd.DataFrame(columns=manifest["columns"])
+
+    store_dir = _store_dir(ngb_id)
+    matches_df = pd.concat(
+        [pd.read_pickle(store_dir / f"{name}.pkl") for name in names],
+        ignore_index=True,
+    )
+    selected = pd.Series(True, index=matches_df.index)
+    if start is not None:
+        selected &= matches_df["MatchDatePandas"] >= pd.Timestamp(start)
+    if end is not None:
+        selected &= matches_df["MatchDatePandas"] < pd.Timestamp(end) + pd.Timedelta(
+            days=1
+        )
+    if tournament_ids is not None:
+        selected &= matches_df["TournamentID"].isin(list(tournament_ids))
+    if players is not None:
+        players = list(players)
+        selected &= matches_df["hPlayerName"].isin(players) | matches_df[
+            "vPlayerName"
+        ].isin(players)
+    matches_df = matches_df.loc[selected]
+    matches_df = matches_df.sort_values(
+        by=["MatchDatePandas"], kind="stable", ignore_index=True
+    )
+    return matches_df
+
+
+def prune_partitions(
+    manifest: dict,
+    start: Optional[dt.date] = None,
+    end: Optional[dt.date] = None,
+    tournament_ids: Optional[Iterable[int]] = None,
+    players: Optional[Iterable[str]] = None,
+) -> list:
+    if tournament_ids is not None:
+        tournament_ids = {int(tournament_id) for tournament_id in tournament_ids}
+    if players is not None:
+        players = set(players)
+    start = str(pd.Timestamp(start)) if start is not None else None
+    end = str(pd.Timestamp(end) + pd.Timedelta(days=1)) if end is not None else None
+
+    names = []
+    for name, partition in manifest["partitions"].items():
+        if start is not None and partition["max_date"] < start:
+            continue
+        if end is not None and partition["min_date"] >= end:
+            continue
+        if tournament_ids is not None and partition["tournament_id"] not in (
+            tournament_ids
+        ):
+            continue
+        if players is not None and players.isdisjoint(partition["players"]):
+            continue
+        names.append(name)
+    return names
+
+
+def load_manifest(ngb_id: int = ROOT_PARTITION_NGB_ID) -> dict:
+    # The manifest is parsed again only when its file has changed.
+    manifest_path = _store_dir(ngb_id) / MANIFEST_FILE_NAME
+    try:
+        modified = manifest_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        modified = None
+    with _manifest_lock:
+        cached = _manifests.get(ngb_id)
+        if modified is not None and cached is not None and cached[0] == modified:
+            return cached[1]
+    if modified is not None:
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("version") == MATCH_STORE_VERSION:
+            with _manifest_lock:
+                _manifests[ngb_id] = (modified, manifest)
+            return manifest
+        shutil.rmtree(_store_dir(ngb_id))
+    return {
+        "version": MATCH_STORE_VERSION,
+        "raw_date": None,
+        "sources": None,
+        "columns": [],
+        "partitions": {},
+    }
+
+
+def _store_dir(ngb_id: int):
+    return partition_dir(ngb_id) / MATCH_STORE_DIR_NAME
+
+
+def _save_manifest(manifest: dict, ngb_id: int) -> None:
+    store_dir = _store_dir(ngb_id)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = store_dir / MANIFEST_FILE_NAME
+    temporary_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(temporary_path, manifest_path)
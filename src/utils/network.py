@@ -0,0 +1,202 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from utils.search import factorize_players
+
+try:
+    import graphviz
+except ImportError:
+    graphviz = None
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-10
+PAGERANK_MAX_ITERATIONS = 100
+NEIGHBORHOOD_LIMIT = 25
+
+
+class PlayerNetwork:
+    # Players are the nodes and the number of matches between two players is
+    # the weight of the edge between them, in a symmetric sparse adjacency
+    # matrix indexed by player ID.
+    def __init__(self, matches_df: pd.DataFrame) -> None:
+        home_ids, visitor_ids, self.names = factorize_players(matches_df)
+        self._ids = pd.Index(self.names)
+        players = len(self.names)
+        adjacency = sparse.coo_matrix(
+            (np.ones(len(home_ids)), (home_ids, visitor_ids)),
+            shape=(players, players),
+        ).tocsr()
+        self.adjacency = (adjacency + adjacency.T).tocsr()
+        # Directed from the winner to the loser of each decided match.
+        home_won = (matches_df["Winner"] == "H").values
+        visitor_won = (matches_df["Winner"] == "V").values
+        self.wins = sparse.coo_matrix(
+            (
+                np.ones(home_won.sum() + visitor_won.sum()),
+                (
+                    np.concatenate([home_ids[home_won], visitor_ids[visitor_won]]),
+                    np.concatenate([visitor_ids[home_won], home_ids[visitor_won]]),
+                ),
+            ),
+            shape=(players, players),
+        ).tocsr()
+
+        components, labels = csgraph.connected_components(
+            self.adjacency, directed=False
+        )
+        # Components are numbered from the largest down.
+        sizes = np.bincount(labels, minlength=components)
+        order = np.argsort(-sizes, kind="stable")
+        self.labels = np.empty(components, dtype=np.int64)
+        self.labels[order] = np.arange(components)
+        self.labels = self.labels[labels]
+
+        self.players = pd.DataFrame(
+            {
+                "Player": self.names,
+                "Component": self.labels,
+                "Matches": np.asarray(self.adjacency.sum(axis=1)).ravel(),
+                "Opponents": np.diff(self.adjacency.indptr),
+                "Centrality": _pagerank(self.adjacency),
+            }
+        )
+        self.players["CentralityRank"] = (
+            self.players["Centrality"].rank(ascending=False, method="min").astype(int)
+        )
+        self.players["OpponentsRank"] = (
+            self.players["Opponents"].rank(ascending=False, method="min").astype(int)
+        )
+
+        component_df = pd.DataFrame(
+            {
+                "Component": self.labels[home_ids],
+                "Division": matches_df["Division"].values,
+            }
+        )
+        self.components = pd.DataFrame(
+            {
+                "Players": np.bincount(self.labels),
+                "Matches": np.bincount(self.labels[home_ids], minlength=components),
+                # The most common division of the matches of the component.
+                "Division": component_df.value_counts()
+                .reset_index()
+                .drop_duplicates(subset="Component")
+                .set_index("Component")["Division"],
+            }
+        ).rename_axis("Component")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def player_id(self, name: str) -> Optional[int]:
+        position = self._ids.get_indexer([name])[0]
+        return None if position < 0 else int(position)
+
+    def neighborhood(self, name: str, limit: int = NEIGHBORHOOD_LIMIT) -> np.ndarray:
+        # The player and the opponents met most often, as player IDs.
+        player_id = self.player_id(name)
+        if player_id is None:
+            return np.empty(0, dtype=np.int64)
+        row = self.adjacency.getrow(player_id)
+        opponents = row.indices[np.argsort(-row.data, kind="stable")][: limit - 1]
+        return np.concatenate([[player_id], opponents])
+
+    def common_opponents(self, first: str, second: str) -> pd.DataFrame:
+        # The opponents both players have met, with the results of each.
+        first_id, second_id = self.player_id(first), self.player_id(second)
+        columns = [
+            f"{first} Wins",
+            f"{first} Losses",
+            f"{second} Wins",
+            f"{second} Losses",
+        ]
+        if first_id is None or second_id is None:
+            return pd.DataFrame(
+                columns=columns, index=pd.Index([], name="Opponent"), dtype=int
+            )
+        opponents = np.setdiff1d(
+            np.intersect1d(
+                self.adjacency.getrow(first_id).indices,
+                self.adjacency.getrow(second_id).indices,
+            ),
+            [first_id, second_id],
+        )
+        return pd.DataFrame(
+            dict(
+                zip(
+                    columns,
+                    [
+                        self._win_counts(first_id, opponents),
+                        self._loss_counts(first_id, opponents),
+                        self._win_counts(second_id, opponents),
+                        self._loss_counts(second_id, opponents),
+                    ],
+                )
+            ),
+            index=pd.Index(self.names[opponents], name="Opponent"),
+        )
+
+    def win_path(self, first: str, second: str) -> List[str]:
+        # The shortest chain of wins from the first player to the second, as
+        # in first beat X and X beat second, found with a breadth-first search
+        # of the win graph. Empty when there is no such chain.
+        first_id, second_id = self.player_id(first), self.player_id(second)
+        if first_id is None or second_id is None:
+            return []
+        _, predecessors = csgraph.breadth_first_order(
+            self.wins, first_id, directed=True, return_predecessors=True
+        )
+        if first_id == second_id or predecessors[second_id] < 0:
+            return []
+        path = [second_id]
+        while path[-1] != first_id:
+            path.append(predecessors[path[-1]])
+        return self.names[path[::-1]].tolist()
+
+    def _win_counts(self, player_id: int, opponents: np.ndarray) -> np.ndarray:
+        return self.wins[player_id, opponents].toarray().ravel().astype(int)
+
+    def _loss_counts(self, player_id: int, opponents: np.ndarray) -> np.ndarray:
+        return self.wins[opponents, player_id].toarray().ravel().astype(int)
+
+    def neighborhood_graph(self, name: str, limit: int = NEIGHBORHOOD_LIMIT):
+        # Returns None when the graphviz package is not installed.
+        if graphviz is None:
+            return None
+        nodes = self.neighborhood(name, limit)
+        edges = sparse.triu(self.adjacency[nodes][:, nodes], k=1).tocoo()
+        graph = graphviz.Graph(name=name, graph_attr={"overlap": "false"})
+        for position, player_id in enumerate(nodes):
+            attributes = {"style": "filled"} if position == 0 else {}
+            graph.node(str(player_id), label=self.names[player_id], **attributes)
+        for first, second, matches in zip(edges.row, edges.col, edges.data):
+            graph.edge(
+                str(nodes[first]),
+                str(nodes[second]),
+                label=str(int(matches)),
+                penwidth=str(min(1 + matches / 2, 5)),
+            )
+        return graph
+
+
+def _pagerank(adjacency: sparse.csr_matrix) -> np.ndarray:
+    # Power iteration on the match graph. Every node has at least one edge,
+    # since players only appear through their matches.
+    players = adjacency.shape[0]
+    if players == 0:
+        return np.empty(0)
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    transition = sparse.diags(1 / degrees) @ adjacency
+    ranks = np.full(players, 1 / players)
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        updated = (1 - PAGERANK_DAMPING) / players + PAGERANK_DAMPING * (
+            transition.T @ ranks
+        )
+        if np.abs(updated - ranks).sum() < PAGERANK_TOLERANCE:
+            return updated
+        ranks = updated
+    return ranks
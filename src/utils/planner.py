@@ -0,0 +1,102 @@
+import datetime as dt
+import json
+import os
+import threading
+from typing import List, NamedTuple, Tuple
+
+import pandas as pd
+
+from utils.catalog import DATA_DIR
+
+EMPTY_RESPONSES_PATH = DATA_DIR / "empty_responses.json"
+# Results can still be entered for a few days after a tournament date, so an
+# empty response is only trusted once the date is older than this.
+EMPTY_RESPONSE_GRACE_DAYS = 7
+
+_empty_responses = None
+_empty_responses_lock = threading.Lock()
+
+
+class RequestPlan(NamedTuple):
+    requests: List[Tuple[int, str]]
+    skipped_scheduled: int
+    skipped_future: int
+    skipped_empty: int
+
+    @property
+    def avoided(self) -> int:
+        return self.skipped_scheduled + self.skipped_future + self.skipped_empty
+
+
+def plan_match_requests(
+    tournaments_df: pd.DataFrame, today: dt.date = None
+) -> RequestPlan:
+    if today is None:
+        today = dt.datetime.now().date()
+    # A copy, since the shared set grows while the requests are made.
+    with _empty_responses_lock:
+        empty_responses = set(_load_empty_responses())
+    requests = []
+    skipped_scheduled = 0
+    skipped_future = 0
+    skipped_empty = 0
+    for tournament_id, start_date, end_date, tournament_type in zip(
+        tournaments_df["TournamentID"].values.tolist(),
+        tournaments_df["StartDate"].values.tolist(),
+        tournaments_df["EndDate"].values.tolist(),
+        tournaments_df["Type"].values.tolist(),
+    ):
+        dates = [x.date() for x in pd.date_range(start_date, end_date)]
+        if tournament_type == "scheduled" and dates and dates[0] > today:
+            skipped_scheduled += len(dates)
+            continue
+        for date in dates:
+            if date > today:
+                skipped_future += 1
+            elif (tournament_id, str(date)) in empty_responses:
+                skipped_empty += 1
+            else:
+                requests.append((tournament_id, str(date)))
+    return RequestPlan(requests, skipped_scheduled, skipped_future, skipped_empty)
+
+
+def record_empty_response(tournament_id: int, date: str, today: dt.date = None) -> None:
+    if today is None:
+        today = dt.datetime.now().date()
+    if dt.date.fromisoformat(date) >= today - dt.timedelta(
+        days=EMPTY_RESPONSE_GRACE_DAYS
+    ):
+        return
+    with _empty_responses_lock:
+        _load_empty_responses().add((int(tournament_id), date))
+
+
+def save_empty_responses() -> None:
+    with _empty_responses_lock:
+        empty_responses = _load_empty_responses()
+        by_tournament = {}
+        for tournament_id, date in sorted(empty_responses):
+            by_tournament.setdefault(str(tournament_id), []).append(date)
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        temporary_path = EMPTY_RESPONSES_PATH.with_name(
+            EMPTY_RESPONSES_PATH.name + ".tmp"
+        )
+        with open(temporary_path, "w", encoding="utf-8") as empty_responses_file:
+            json.dump(by_tournament, empty_responses_file, indent=2)
+        os.replace(temporary_path, EMPTY_RESPONSES_PATH)
+
+
+def _load_empty_responses() -> set:
+    # Callers hold _empty_responses_lock.
+    global _empty_responses
+    if _empty_responses is None:
+        _empty_responses = set()
+        if EMPTY_RESPONSES_PATH.exists():
+            with open(
+                EMPTY_RESPONSES_PATH, "r", encoding="utf-8"
+            ) as empty_responses_file:
+                for tournament_id, dates in json.load(empty_responses_file).items():
+                    _empty_responses.update(
+                        (int(tournament_id), date) for date in dates
+                    )
+    return _empty_responses
@@ -0,0 +1,192 @@
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.form import rolling_form, streak_records
+from utils.games import game_analytics, player_game_stats
+from utils.search import factorize_players
+
+
+class PlayerProfile(NamedTuple):
+    name: str
+    stats: pd.Series
+    games: pd.Series
+    matches: pd.DataFrame
+    form: pd.DataFrame
+    yearly: pd.DataFrame
+    opponents: pd.DataFrame
+    tournaments: pd.DataFrame
+    scores: pd.DataFrame
+
+
+class PlayerProfileStore:
+    # Every match appears twice in a long frame, once from the point of view of
+    # each player. The long frame and the per-player tables are sorted by
+    # player ID, and offsets into them are kept per player, so a profile is a
+    # handful of slices instead of scans over all matches.
+    def __init__(self, matches_df: pd.DataFrame, scores: np.ndarray) -> None:
+        home_ids, visitor_ids, self.names = factorize_players(matches_df)
+        self._ids = pd.Index(self.names)
+        self._matches_df = matches_df
+
+        analytics = game_analytics(scores)
+        winner_games = (analytics.played & analytics.won).sum(axis=1)
+        loser_games = (analytics.played & ~analytics.won).sum(axis=1)
+        winner_rallies = analytics.margins.sum(axis=1)
+        home_won = (matches_df["Winner"] == "H").values
+        visitor_won = (matches_df["Winner"] == "V").values
+        self._games = player_game_stats(
+            analytics,
+            np.select([home_won, visitor_won], [home_ids, visitor_ids], -1),
+            np.select([home_won, visitor_won], [visitor_ids, home_ids], -1),
+            len(self.names),
+        )
+        rows = np.arange(len(matches_df))
+        long_df = pd.DataFrame(
+            {
+                "Player": np.concatenate([home_ids, visitor_ids]),
+                "Opponent": np.concatenate([visitor_ids, home_ids]),
+                "Row": np.concatenate([rows, rows]),
+                "Won": np.concatenate([home_won, visitor_won]),
+                "Lost": np.concatenate([visitor_won, home_won]),
+                "GamesWon": np.concatenate(
+                    [
+                        np.where(home_won, winner_games, loser_games),
+                        np.where(visitor_won, winner_games, loser_games),
+                    ]
+                ),
+                "GamesLost": np.concatenate(
+                    [
+                        np.where(home_won, loser_games, winner_games),
+                        np.where(visitor_won, loser_games, winner_games),
+                    ]
+                ),
+                "Rallies": np.tile(matches_df["Rallies"].values, 2),
+                "RallyDifferential": np.concatenate(
+                    [
+                        np.where(home_won, winner_rallies, -winner_rallies),
+                        np.where(visitor_won, winner_rallies, -winner_rallies),
+                    ]
+                ),
+                "Minutes": np.tile(matches_df["MatchDuration"].values, 2),
+                "Year": np.tile(matches_df["Year"].values, 2),
+                "TournamentID": np.tile(matches_df["TournamentID"].values, 2),
+                "TournamentName": np.tile(matches_df["TournamentName"].values, 2),
+                "MatchDatePandas": np.tile(matches_df["MatchDatePandas"].values, 2),
+            }
+        )
+        long_df = long_df.sort_values(
+            by=["Player", "Row"], kind="stable", ignore_index=True
+        )
+        long_df["Score"] = (
+            long_df["GamesWon"].astype(str) + "-" + long_df["GamesLost"].astype(str)
+        )
+        outcomes = long_df["Won"].values.astype(np.int64) - long_df["Lost"].values
+        long_df = long_df.join(
+            rolling_form(
+                long_df["Player"].values,
+                outcomes,
+                long_df["RallyDifferential"].values,
+            )
+        )
+        self._long_df = long_df
+        self._offsets = _offsets(long_df["Player"].values, len(self.names))
+
+        self._stats = _player_stats(long_df, len(self.names)).join(
+            streak_records(long_df["Player"].values, outcomes, len(self.names))
+        )
+        self._tables = {
+            "yearly": self._player_table(long_df, "Year"),
+            "opponents": self._player_table(long_df, "Opponent"),
+            "tournaments": self._player_table(
+                long_df, ["TournamentID", "TournamentName"]
+            ),
+            "scores": self._player_table(long_df, "Score"),
+        }
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def player_id(self, name: str) -> Optional[int]:
+        position = self._ids.get_indexer([name])[0]
+        return None if position < 0 else int(position)
+
+    def profile(self, name: str) -> Optional[PlayerProfile]:
+        player_id = self.player_id(name)
+        if player_id is None:
+            return None
+        first, last = self._offsets[player_id], self._offsets[player_id + 1]
+        player_df = self._long_df.iloc[first:last]
+        tables = {
+            table_name: table_df.iloc[offsets[player_id] : offsets[player_id + 1]]
+            .droplevel("Player")
+            .sort_values(by="Matches", ascending=False, kind="stable")
+            for table_name, (table_df, offsets) in self._tables.items()
+        }
+        tables["yearly"] = tables["yearly"].sort_index()
+        tables["tournaments"] = tables["tournaments"].sort_values(
+            by="Last", ascending=False, kind="stable"
+        )
+        tables["opponents"].index = self.names[tables["opponents"].index]
+        return PlayerProfile(
+            name=name,
+            stats=self._stats.iloc[player_id],
+            games=self._games.iloc[player_id],
+            matches=self._matches_df.iloc[player_df["Row"].values],
+            form=pd.DataFrame(
+                {
+                    "MatchDatePandas": player_df["MatchDatePandas"].values,
+                    "Opponent": self.names[player_df["Opponent"].values],
+                    "RallyDifferential": player_df["RallyDifferential"].values,
+                    "RollingWinRate": player_df["RollingWinRate"].values,
+                    "RollingRallyDifferential": player_df[
+                        "RollingRallyDifferential"
+                    ].values,
+                    "Streak": player_df["Streak"].values,
+                }
+            ),
+            **tables,
+        )
+
+    def _player_table(
+        self, long_df: pd.DataFrame, by
+    ) -> Tuple[pd.DataFrame, np.ndarray]:
+        by = [by] if isinstance(by, str) else by
+        table_df = long_df.groupby(by=["Player"] + by, sort=True).agg(
+            Matches=("Row", "size"),
+            Wins=("Won", "sum"),
+            Losses=("Lost", "sum"),
+            Last=("MatchDatePandas", "max"),
+        )
+        table_df["Win Percentage"] = _win_percentage(table_df)
+        return table_df, _offsets(
+            table_df.index.get_level_values("Player").values, len(self.names)
+        )
+
+
+def _offsets(sorted_ids: np.ndarray, players: int) -> np.ndarray:
+    return np.searchsorted(sorted_ids, np.arange(players + 1), side="left")
+
+
+def _player_stats(long_df: pd.DataFrame, players: int) -> pd.DataFrame:
+    stats_df = long_df.groupby(by="Player", sort=True).agg(
+        Wins=("Won", "sum"),
+        Losses=("Lost", "sum"),
+        GamesWon=("GamesWon", "sum"),
+        GamesLost=("GamesLost", "sum"),
+        Rallies=("Rallies", "sum"),
+        Minutes=("Minutes", "sum"),
+        Tournaments=("TournamentID", "nunique"),
+        Opponents=("Opponent", "nunique"),
+        First=("MatchDatePandas", "min"),
+        Last=("MatchDatePandas", "max"),
+    )
+    stats_df.insert(0, "Matches", stats_df["Wins"] + stats_df["Losses"])
+    stats_df["Win Percentage"] = _win_percentage(stats_df)
+    return stats_df.reindex(np.arange(players))
+
+
+def _win_percentage(df: pd.DataFrame) -> pd.Series:
+    decided = df["Wins"] + df["Losses"]
+    return (100 * df["Wins"] / decided.where(decided > 0)).round().fillna(0)
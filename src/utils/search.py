@@ -0,0 +1,96 @@
+import difflib
+import unicodedata
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+SEARCH_RESULT_LIMIT = 20
+FUZZY_CUTOFF = 0.7
+
+
+def normalize_name(name: str) -> str:
+    # Accents are folded away, so "Tytti Jarvinen" finds "Tytti Järvinen".
+    decomposed = unicodedata.normalize("NFKD", name)
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(folded.casefold().split())
+
+
+def factorize_players(
+    matches_df: pd.DataFrame,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Player IDs are positions in the sorted names, so every structure built
+    # from the same matches agrees on them.
+    player_ids, names = pd.factorize(
+        np.concatenate(
+            [matches_df["hPlayerName"].values, matches_df["vPlayerName"].values]
+        ),
+        sort=True,
+    )
+    return player_ids[: len(matches_df)], player_ids[len(matches_df) :], names
+
+
+class PlayerSearchIndex:
+    # Every player gets an integer ID by factorizing the names of both match
+    # columns. Each normalized full name and each name token after the first is
+    # a search key, kept in one sorted array, so a prefix search is two binary
+    # searches. Results are ordered by the number of matches of the player.
+    def __init__(self, matches_df: pd.DataFrame) -> None:
+        home_ids, visitor_ids, self.names = factorize_players(matches_df)
+        self.match_counts = np.bincount(
+            np.concatenate([home_ids, visitor_ids]), minlength=len(self.names)
+        )
+
+        keys = []
+        key_ids = []
+        for player_id, name in enumerate(self.names):
+            normalized = normalize_name(name)
+            tokens = normalized.split(" ")
+            for position in range(len(tokens)):
+                keys.append(" ".join(tokens[position:]))
+                key_ids.append(player_id)
+        order = np.argsort(keys, kind="stable")
+        self._keys = np.array(keys, dtype=object)[order].astype(str)
+        self._key_ids = np.array(key_ids, dtype=np.int64)[order]
+        self._unique_keys = list(dict.fromkeys(self._keys))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        # The names are sorted, since they come from a sorted factorization.
+        position = self.names.searchsorted(name)
+        return position < len(self.names) and self.names[position] == name
+
+    def search(self, query: str, limit: int = SEARCH_RESULT_LIMIT) -> List[str]:
+        query = normalize_name(query)
+        if not query:
+            return self.most_active(limit)
+
+        first = self._keys.searchsorted(query, side="left")
+        last = self._keys.searchsorted(query + "\uffff", side="left")
+        player_ids = self._rank(self._key_ids[first:last])
+        if len(player_ids) < limit:
+            # Typos fall back to fuzzy matching, closest keys first.
+            close_keys = difflib.get_close_matches(
+                query, self._unique_keys, n=limit, cutoff=FUZZY_CUTOFF
+            )
+            player_ids = pd.unique(
+                np.concatenate(
+                    [player_ids]
+                    + [self._rank(self._ids_of_key(key)) for key in close_keys]
+                )
+            )
+        return self.names[player_ids[:limit]].tolist()
+
+    def most_active(self, limit: int = SEARCH_RESULT_LIMIT) -> List[str]:
+        return self.names[self._rank(np.arange(len(self.names)))[:limit]].tolist()
+
+    def _ids_of_key(self, key: str) -> np.ndarray:
+        first = self._keys.searchsorted(key, side="left")
+        last = self._keys.searchsorted(key, side="right")
+        return self._key_ids[first:last]
+
+    def _rank(self, player_ids: np.ndarray) -> np.ndarray:
+        player_ids = np.unique(player_ids)
+        return player_ids[np.argsort(-self.match_counts[player_ids], kind="stable")]
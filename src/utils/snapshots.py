@@ -0,0 +1,185 @@
+import datetime as dt
+import os
+from typing import Optional
+
+import pandas as pd
+
+from utils.catalog import (
+    ROOT_PARTITION_NGB_ID,
+    get_snapshot_entry,
+    load_catalog,
+    partition_dir,
+    register_snapshot,
+    remove_snapshot,
+    snapshot_dates,
+)
+from utils.diff import SnapshotDiff, diff_snapshots
+
+SNAPSHOT_KEYS = {
+    "tournaments": ["TournamentID"],
+    "matches": ["matchid"],
+    "rankings": ["division", "playerId"],
+}
+# Writes start a new base once a delta chain reaches MAX_CHAIN_LENGTH.
+# Compaction rebases the longer chains left behind down to a shorter one, so
+# that reading an old snapshot applies at most a week of deltas.
+MAX_CHAIN_LENGTH = 30
+COMPACT_CHAIN_LENGTH = 7
+
+
+def write_snapshot(
+    df_to_save: pd.DataFrame,
+    dataset: str,
+    snapshot_date: dt.date,
+    source: str = "clublocker",
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> dict:
+    parent_entry = get_snapshot_entry(
+        dataset, as_of=snapshot_date - dt.timedelta(days=1), ngb_id=ngb_id
+    )
+    if parent_entry is not None and parent_entry["chain_length"] < MAX_CHAIN_LENGTH:
+        parent_df = read_snapshot(dataset, parent_entry, ngb_id=ngb_id)
+        try:
+            diff = diff_snapshots(parent_df, df_to_save, SNAPSHOT_KEYS[dataset])
+        except ValueError:
+            diff = None
+        if diff is not None:
+            return _write_delta(
+                diff,
+                len(df_to_save),
+                dataset,
+                parent_entry,
+                snapshot_date,
+                source,
+                ngb_id,
+            )
+    return _write_base(df_to_save, dataset, snapshot_date, source, ngb_id)
+
+
+def read_snapshot(
+    dataset: str, entry: Optional[dict] = None, ngb_id: int = ROOT_PARTITION_NGB_ID
+) -> pd.DataFrame:
+    if entry is None:
+        entry = get_snapshot_entry(dataset, ngb_id=ngb_id)
+    snapshots = load_catalog(ngb_id)["snapshots"][dataset]
+    data_dir = partition_dir(ngb_id)
+    chain = [entry]
+    while chain[-1]["kind"] == "delta":
+        chain.append(snapshots[chain[-1]["parent"]])
+    snapshot_df = pd.read_pickle(data_dir / chain[-1]["file"])
+    for delta_entry in reversed(chain[:-1]):
+        delta = pd.read_pickle(data_dir / delta_entry["file"])
+        snapshot_df = _apply_delta(snapshot_df, delta)
+    return snapshot_df
+
+
+def compact_snapshots(
+    dataset: str,
+    max_chain_length: int = COMPACT_CHAIN_LENGTH,
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> list:
+    compacted = []
+    for snapshot_date in snapshot_dates(dataset, ngb_id=ngb_id):
+        entry = get_snapshot_entry(dataset, as_of=snapshot_date, ngb_id=ngb_id)
+        if entry["chain_length"] > max_chain_length:
+            _rebase_snapshot(dataset, entry, ngb_id)
+            compacted.append(snapshot_date)
+    return compacted
+
+
+def apply_retention(
+    dataset: str,
+    keep_days: int,
+    today: dt.date = None,
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> list:
+    if today is None:
+        today = dt.datetime.now().date()
+    cutoff = today - dt.timedelta(days=keep_days)
+    dates = snapshot_dates(dataset, ngb_id=ngb_id)
+    expired = [date for date in dates if date < cutoff]
+    if not expired:
+        return []
+    # Always keep the latest snapshot, and make the oldest kept one readable on
+    # its own before the snapshots it depends on are removed.
+    if len(expired) == len(dates):
+        expired = expired[:-1]
+    oldest_kept = get_snapshot_entry(dataset, as_of=dates[len(expired)], ngb_id=ngb_id)
+    if oldest_kept["kind"] == "delta":
+        _rebase_snapshot(dataset, oldest_kept, ngb_id)
+    for snapshot_date in expired:
+        entry = remove_snapshot(dataset, snapshot_date, ngb_id=ngb_id)
+        os.remove(partition_dir(ngb_id) / entry["file"])
+    return expired
+
+
+def _write_base(
+    df_to_save: pd.DataFrame,
+    dataset: str,
+    snapshot_date: dt.date,
+    source: str,
+    ngb_id: int,
+) -> dict:
+    file_name = f"{dataset}_{str(snapshot_date)}.pkl"
+    partition_dir(ngb_id).mkdir(parents=True, exist_ok=True)
+    df_to_save.to_pickle(partition_dir(ngb_id) / file_name)
+    return register_snapshot(
+        dataset,
+        snapshot_date,
+        file_name,
+        rows=len(df_to_save),
+        source=source,
+        ngb_id=ngb_id,
+    )
+
+
+def _write_delta(
+    diff: SnapshotDiff,
+    rows: int,
+    dataset: str,
+    parent_entry: dict,
+    snapshot_date: dt.date,
+    source: str,
+    ngb_id: int,
+) -> dict:
+    keys = SNAPSHOT_KEYS[dataset]
+    delta = {
+        "parent": parent_entry["date"],
+        "keys": keys,
+        "rows": rows,
+        "upserts": pd.concat([diff.inserted, diff.updated], ignore_index=True),
+        "deleted": diff.deleted[keys].reset_index(drop=True),
+    }
+    file_name = f"{dataset}_{str(snapshot_date)}.delta.pkl"
+    pd.to_pickle(delta, partition_dir(ngb_id) / file_name)
+    return register_snapshot(
+        dataset,
+        snapshot_date,
+        file_name,
+        rows=rows,
+        source=source,
+        ngb_id=ngb_id,
+        kind="delta",
+        parent=parent_entry["date"],
+        delta_rows=diff.changed_rows,
+    )
+
+
+def _rebase_snapshot(dataset: str, entry: dict, ngb_id: int) -> dict:
+    snapshot_df = read_snapshot(dataset, entry, ngb_id=ngb_id)
+    snapshot_date = dt.date.fromisoformat(entry["date"])
+    rebased_entry = _write_base(
+        snapshot_df, dataset, snapshot_date, entry["source"], ngb_id
+    )
+    os.remove(partition_dir(ngb_id) / entry["file"])
+    return rebased_entry
+
+
+def _apply_delta(parent_df: pd.DataFrame, delta: dict) -> pd.DataFrame:
+    keys = delta["keys"]
+    parent_index = pd.MultiIndex.from_frame(parent_df[keys])
+    replaced_index = pd.MultiIndex.from_frame(
+        pd.concat([delta["upserts"][keys], delta["deleted"][keys]])
+    )
+    kept_df = parent_df.loc[~parent_index.isin(replaced_index)]
+    return pd.concat([kept_df, delta["upserts"]], ignore_index=True)
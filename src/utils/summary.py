@@ -0,0 +1,99 @@
+from typing import Callable, Dict, NamedTuple, Optional
+
+import pandas as pd
+
+from utils.catalog import ROOT_PARTITION_NGB_ID, get_summary_record, register_summary
+
+# Bump whenever the fields of SnapshotSummary or the way they are computed change.
+SUMMARY_VERSION = 1
+
+
+class SnapshotSummary(NamedTuple):
+    tournaments: int
+    matches: int
+    games: int
+    rallies: int
+    minutes: float
+    average_games: float
+    average_rallies: float
+    average_minutes: float
+    average_players: float
+    first_tournament: str
+    last_tournament: str
+    first_match: str
+    last_match: str
+    players_by_division: Dict[str, int]
+
+
+def summarize(
+    tournaments_df: pd.DataFrame, matches_df: pd.DataFrame, rankings_df: pd.DataFrame
+) -> SnapshotSummary:
+    return SnapshotSummary(
+        tournaments=len(tournaments_df),
+        matches=len(matches_df),
+        games=int(matches_df["NumberOfGames"].sum()),
+        rallies=int(matches_df["Rallies"].sum()),
+        minutes=float(matches_df["MatchDuration"].sum()),
+        average_games=float(matches_df["NumberOfGames"].mean()),
+        average_rallies=float(matches_df["Rallies"].mean()),
+        average_minutes=float(matches_df["MatchDuration"].mean()),
+        average_players=float(tournaments_df["NumPlayers"].mean()),
+        first_tournament=str(tournaments_df["StartDatePandas"].min().date()),
+        last_tournament=str(tournaments_df["StartDatePandas"].max().date()),
+        first_match=str(matches_df["MatchDatePandas"].min().date()),
+        last_match=str(matches_df["MatchDatePandas"].max().date()),
+        players_by_division={
+            division: int(players)
+            for division, players in rankings_df["division"].value_counts().items()
+        },
+    )
+
+
+def get_snapshot_summary(
+    entries: Dict[str, dict],
+    compute: Callable[[], SnapshotSummary],
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> SnapshotSummary:
+    # Pages only read the record. It is computed again, but not stored, when
+    # it is missing or was computed from other files.
+    record = _current_record(entries, ngb_id)
+    if record is not None:
+        return SnapshotSummary(**record["summary"])
+    return compute()
+
+
+def update_snapshot_summary(
+    entries: Dict[str, dict],
+    compute: Callable[[], SnapshotSummary],
+    ngb_id: int = ROOT_PARTITION_NGB_ID,
+) -> None:
+    # Called once the snapshots are written, so that the record is in the
+    # catalog for other tools before anyone opens the app.
+    if _current_record(entries, ngb_id) is not None:
+        return
+    register_summary(
+        entries["matches"]["date"],
+        {
+            "version": SUMMARY_VERSION,
+            "sources": _sources(entries),
+            "summary": compute()._asdict(),
+        },
+        ngb_id=ngb_id,
+    )
+
+
+def _current_record(entries: Dict[str, dict], ngb_id: int) -> Optional[dict]:
+    # The record is stored in the catalog under the date of the matches
+    # snapshot, and is only valid when it was computed from the same files.
+    record = get_summary_record(entries["matches"]["date"], ngb_id=ngb_id)
+    if (
+        record is not None
+        and record["version"] == SUMMARY_VERSION
+        and record["sources"] == _sources(entries)
+    ):
+        return record
+    return None
+
+
+def _sources(entries: Dict[str, dict]) -> Dict[str, str]:
+    return {dataset: entry["checksum"] for dataset, entry in entries.items()}
@@ -1,10 +1,49 @@
 from invoke import task
 from datetime import datetime
 import glob
+import sys
+
+sys.path.insert(0, 'src')
+
+from utils.assets import build_static_assets
+import config_file
+from utils.catalog import DATASETS, ROOT_PARTITION_NGB_ID, partition_dir, rebuild_catalog, remove_snapshot
+from utils.exports import prune_exports
+from utils.extraction import crawl_federations
+from utils.snapshots import COMPACT_CHAIN_LENGTH, apply_retention, compact_snapshots
 
 @task
-def clean(c):
-    files = glob.glob(f'./data/*{str(datetime.now().date())}*')
+def clean(c, ngb_id=ROOT_PARTITION_NGB_ID):
+    files = glob.glob(f'{partition_dir(int(ngb_id))}/*{str(datetime.now().date())}*')
     for file in files:
         print(f'Deleting file {file}')
-        c.run(f'rm {file}')
\ No newline at end of file
+        c.run(f'rm {file}')
+    for dataset in DATASETS:
+        remove_snapshot(dataset, datetime.now().date(), ngb_id=int(ngb_id))
+    for file in prune_exports(int(ngb_id)):
+        print(f'Deleted export {file}')
+
+@task
+def catalog(c, ngb_id=ROOT_PARTITION_NGB_ID):
+    catalog = rebuild_catalog(int(ngb_id))
+    for dataset, latest in catalog['latest'].items():
+        print(f'Latest {dataset} snapshot: {latest}')
+
+@task
+def compact(c, keep_days=365, max_chain=COMPACT_CHAIN_LENGTH, ngb_id=ROOT_PARTITION_NGB_ID):
+    for dataset in DATASETS:
+        for date in compact_snapshots(dataset, max_chain_length=int(max_chain), ngb_id=int(ngb_id)):
+            print(f'Rebased {dataset} snapshot {date}')
+        for date in apply_retention(dataset, keep_days=int(keep_days), ngb_id=int(ngb_id)):
+            print(f'Removed {dataset} snapshot {date}')
+    for file in prune_exports(int(ngb_id)):
+        print(f'Deleted export {file}')
+
+@task
+def crawl(c):
+    crawl_federations(config_file.data['federations'], config_file.data['history_start'])
+
+@task
+def build_assets(c, force=False):
+    for file in build_static_assets(force=force):
+        print(f'Built asset {file}')
\ No newline at end of file